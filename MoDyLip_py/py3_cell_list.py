@@ -0,0 +1,143 @@
+# #!/usr/bin/python3
+# #encoding-utf8
+
+import itertools
+import numpy as np
+from scipy import sparse
+
+import py3_periodic_metric as metric
+
+class PeriodicCellList():
+    """
+    Radius neighbor search in a periodic box, based on a cell list.
+
+    The box is split into cells whose width along every direction is not
+    smaller than the search radius, 'cutoff', so that all the neighbors of a
+    point lie within its own cell or the adjacent ones. Distances are
+    evaluated under the minimum image convention.
+
+    Usage with a precomputed DBSCAN::
+
+        cells = PeriodicCellList(points, box, eps)
+        DBSCAN(eps=eps, metric='precomputed').fit(cells.RadiusGraph())
+
+    .. Attributes:
+
+    :param box: Dimensions of the periodic box
+    :param cutoff: Search radius
+    :param n_cells: Number of cells along each direction
+    :param width: Cell width along each direction
+    :param metric: Minimum image metric of the box
+
+    :type box: ndarray([dim], dtype=float)
+    :type cutoff: float
+    :type n_cells: ndarray([dim], dtype=int)
+    :type width: ndarray([dim], dtype=float)
+    :type metric: PeriodicMetric
+
+    """
+    def __init__(self, points, box, cutoff):
+        """
+        :param points: Points to be indexed, anywhere in space (they are
+            wrapped into the box)
+        :param box: Dimensions of the periodic box
+        :param cutoff: Search radius
+
+        :type points: ndarray([n_points, dim], dtype=float)
+        :type box: [float]
+        :type cutoff: float
+
+        """
+        self.box = np.asarray(box, dtype=float)
+        assert points.shape[1] == len(self.box), 'Unequal dimensions!!!'
+        assert cutoff > 0., 'cutoff <= 0.'
+        assert np.all(cutoff <= 0.5*self.box), 'cutoff > box/2'
+        self.points = points
+        self.cutoff = float(cutoff)
+        self.metric = metric.PeriodicMetric(self.box)
+        self.n_cells = np.maximum(np.floor(self.box / cutoff).astype(int), 1)
+        self.width = self.box / self.n_cells
+        self._order = None
+        self._start = None
+        self._count = None
+        self._cells = None
+        self._BinPoints()
+
+    def _BinPoints(self):
+        """
+        Sorts points by cell, and sets the first sorted point and the number
+        of points of each cell.
+
+        """
+        cells = np.floor(self.points / self.width).astype(int)
+        cells %= self.n_cells
+        cell_id = np.ravel_multi_index(cells.T, self.n_cells)
+        self._cells = cells
+        self._order = np.argsort(cell_id, kind='stable')
+        self._count = np.bincount(cell_id, minlength=np.prod(self.n_cells))
+        self._start = np.cumsum(self._count) - self._count
+
+    def _Offsets(self):
+        """
+        Relative positions of the adjacent cells, without repetitions when
+        there are less than three cells along a direction.
+
+        """
+        steps = [np.unique(np.array([-1, 0, 1]) % n) for n in self.n_cells]
+        return(np.array(list(itertools.product(*steps))))
+
+    def RadiusNeighbors(self, radius=None):
+        """
+        Pairs of points closer than 'radius' (by default, 'cutoff').
+
+        Each pair is reported once, with 'i < j'.
+
+        :returns: Indexes of both points and their distance
+        :rtype: ndarray([n_pairs], dtype=int), ndarray([n_pairs], dtype=int),
+            ndarray([n_pairs], dtype=float)
+
+        """
+        if(radius is None):
+            radius = self.cutoff
+        assert radius <= self.cutoff, 'radius > cutoff'
+        n_points = len(self.points)
+        pair_i = []
+        pair_j = []
+        pair_d = []
+        for offset in self._Offsets():
+            # Cell adjacent to each point and the points it contains.
+            cells = (self._cells + offset) % self.n_cells
+            cell_id = np.ravel_multi_index(cells.T, self.n_cells)
+            count = self._count[cell_id]
+            total = count.sum()
+            i = np.repeat(np.arange(n_points), count)
+            rank = np.arange(total) - np.repeat(np.cumsum(count) - count, count)
+            j = self._order[np.repeat(self._start[cell_id], count) + rank]
+            keep = (i < j)
+            i = i[keep]
+            j = j[keep]
+            # Minimum image distances.
+            disp = self.metric.Displacement(self.points[i], self.points[j])
+            dist = np.sqrt(np.einsum('ij,ij->i', disp, disp))
+            keep = (dist <= radius)
+            pair_i.append(i[keep])
+            pair_j.append(j[keep])
+            pair_d.append(dist[keep])
+        return(np.concatenate(pair_i), np.concatenate(pair_j),
+            np.concatenate(pair_d))
+
+    def RadiusGraph(self, radius=None):
+        """
+        Symmetric sparse matrix with the distances between all pairs of
+        points closer than 'radius' (by default, 'cutoff'). The diagonal is
+        not stored.
+
+        :rtype: scipy.sparse.csr_matrix([n_points, n_points], dtype=float)
+
+        """
+        i, j, dist = self.RadiusNeighbors(radius)
+        n_points = len(self.points)
+        return(sparse.csr_matrix(
+            (np.concatenate([dist, dist]),
+            (np.concatenate([i, j]), np.concatenate([j, i]))),
+            shape=(n_points, n_points)))
@@ -1,6 +1,17 @@
 #!/usr/bin/python3
 #encoding-utf8
 
+import argparse
+import functools
+import multiprocessing
+import os
+import numpy as np
+import matplotlib.pyplot as plt
+from sklearn.cluster import DBSCAN
+
+import py3_trajectory as traj
+import py3_cell_list as cl
+
 def PlotClusters_1(cfg, lab, box):
     """
     Plot clusters
@@ -75,81 +86,182 @@ def PlotClusters(cfg, cfg_old, lab, box):
 
     plt.show()
 
-def FindClusters(cfg, cfg_old, eps=1.5, min_samples=6, periodic=False, box=[]):
+def FindClusters(cfg, cfg_old, eps=1.5, min_samples=6, periodic=False, box=[],
+    plot=True, index=None):
     """
-    Find density clusters in the
+    Find density clusters in the input configuration.
+
+    Returns the DBSCAN label of each point, with -1 for noise. Periodic
+    clustering runs DBSCAN on the sparse graph of the neighbors within 'eps',
+    under the minimum image convention. The graph is drawn from 'index', a
+    'NeighborIndex' over 'cfg' shared with other analyses, if provided, or
+    from a cell list otherwise.
 
     """
     if(not periodic):
         clf = DBSCAN(eps=eps, min_samples=min_samples)
+        clf.fit(cfg)
     else:
-        myMetric = metric.PeriodicMetric(box)
-        algo = 'brute'
-        clf = DBSCAN(eps=eps, min_samples=min_samples,
-            algorithm=algo, metric=myMetric.Distance)
-
-    clf.fit(cfg)
+        # Periodic radius graph.
+        if(index is None):
+            graph = cl.PeriodicCellList(cfg, box, eps).RadiusGraph()
+        else:
+            assert len(index.points) == len(cfg), 'Index over other points'
+            graph = index.RadiusGraph(eps)
+        clf = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed')
+        clf.fit(graph)
 
     # Plot clusters.
-    mySet = set(clf.labels_)
-    print(mySet)
-    PlotClusters(cfg, cfg_old, clf.labels_, box)
+    if(plot):
+        mySet = set(clf.labels_)
+        print(mySet)
+        PlotClusters(cfg, cfg_old, clf.labels_, box)
+    return(clf.labels_)
 
-def main():
-    """
-    Nothing to be done
+# Per-frame statistics collected by 'AnalyzeFrames'. The width of the 'file'
+# field is set from the input files (see '_FrameStats').
+FRAME_STATS = [('file', 'U'), ('frame', int), ('time', float),
+    ('points', int), ('clusters', int), ('noise', int), ('largest', int),
+    ('mean_size', float)]
 
+def AnalyzeFrame(cfg, eps=1.7, min_samples=5, periodic=True, plot=False):
     """
-    # Check existence of input files
-    for in_file in argv[1:]:
-        assert os.path.isfile(in_file), 'Can\'t open ' + in_file
-    run = []
-    for in_file in argv[1::1]:
-        print(in_file)
-        cfg = conf.Configuration(in_file)
-        cfg.Backfold()
-        cfg.MoveTo([0.,0.,0.])
-        sub_new = cfg.GetSubset(
-            leaflet='upper',
-            arch=cfg.ch_arch[0],
-            block='head',
-            cm=True)
-        coord = [0,1,2]
-        cfg_new = sub_new[:,coord]
-        box = cfg.box[coord]
-        print('box = ', box)
-        print('len(cfg_new) = ', len(cfg_new))
+    Cluster the coarse-grained head groups of the upper leaflet, for the
+    frame held by 'cfg'.
 
+    Returns a (statistics, labels) tuple, where the statistics follow the
+    fields of FRAME_STATS.
+
+    """
+    cfg.Backfold()
+    cfg.MoveTo([0.,0.,0.])
+    selection = dict(
+        leaflet='upper',
+        arch=cfg.ch_arch[0],
+        block='head',
+        cm=True)
+    sub_new = cfg.GetSubset(**selection)
+    coord = [0,1,2]
+    cfg_new = sub_new[:,coord]
+    box = cfg.box[coord]
+    # Neighbor index over the clustered points, shared through the frame.
+    index = cfg.GetNeighborIndex(**selection) if(periodic) else None
+    cfg_old = None
+    if(plot):
         cfg_old = cfg.GetSubset(
             leaflet='upper',
             arch=None,
             block='head',
             cm=False)
+    lab = FindClusters(cfg_new, cfg_old, eps=eps, min_samples=min_samples,
+        periodic=periodic, box=box, plot=plot, index=index)
+    sizes = np.bincount(lab[lab >= 0])
+    stats = (cfg.in_file, cfg.frame, cfg.time, len(lab), len(sizes),
+        np.count_nonzero(lab == -1), sizes.max() if len(sizes) else 0,
+        sizes.mean() if len(sizes) else 0.)
+    return(stats, lab)
 
-        FindClusters(cfg_new, cfg_old, eps=1.7, min_samples=5, periodic=True, box=box)
+def AnalyzeFile(in_file, **kwargs):
+    """
+    Cluster analysis of every frame in the input file, one after another
+    (see 'AnalyzeFrame').
 
-        # lab = DBSCAN(eps=1.2, min_samples=8).fit_predict(cfg)
-        # clf = DBSCAN(eps=1.5, min_samples=8)
-        # clf.fit(cfg)
+    Returns a list with one (statistics, labels) tuple per frame.
 
+    """
+    return([AnalyzeFrame(cfg, **kwargs) for cfg in traj.Trajectory(in_file)])
 
-        # Plot clusters.
-        # lab = clf.labels_
-        # PlotClusters(cfg, lab)
+def _AnalyzeTask(task, **kwargs):
+    """
+    Cluster analysis of a single frame, given as a (file, frame, byte
+    offset) task (see 'AnalyzeFrames').
 
+    """
+    in_file, frame, offset = task
+    cfg = traj.Trajectory(in_file).ReadFrameAt(in_file, offset, frame)
+    return(AnalyzeFrame(cfg, **kwargs))
+
+def AnalyzeFrames(in_files, workers=None, chunksize=1, plot=False, **kwargs):
+    """
+    Cluster analysis of every frame of several input files over a pool of
+    processes.
 
-    print(len(run))
+    The unit of work is a frame: the frames of each file are located by a
+    quick scan of its lines (see 'py3_trajectory.ScanFrames'), and the
+    (file, frame, byte offset) tasks are distributed over 'workers'
+    processes (all cores if None) in chunks of 'chunksize' frames, so that a
+    single file with many concatenated frames is analyzed in parallel too.
+    Results are returned in the order of the input files, and of the frames
+    within each file. Plotting is only possible from the calling process, so
+    that 'plot=True' runs the analysis serially.
 
-if __name__ == '__main__':
-    from sys import argv
-    import numpy as np
-    import copy
-    import os
-    import matplotlib.pyplot as plt
-    from sklearn.cluster import DBSCAN
-    from sklearn.cluster import MeanShift
+    Remaining keyword arguments are passed to 'AnalyzeFrame'.
 
-    import py3_config as conf
-    import py3_periodic_metric as metric
+    :returns: Table with the statistics of each frame (see FRAME_STATS) and
+        list with the cluster labels of each frame
+    :rtype: ndarray(dtype=FRAME_STATS), [ndarray(dtype=int)]
 
+    """
+    for in_file in in_files:
+        assert os.path.isfile(in_file), 'Can\'t open ' + in_file
+    assert chunksize > 0, 'Invalid chunksize'
+    tasks = [(in_file, frame, offset) for in_file in in_files
+        for frame, offset in enumerate(traj.ScanFrames(in_file))]
+    task = functools.partial(_AnalyzeTask, plot=plot, **kwargs)
+    dtype = _FrameStats(in_files)
+    if(plot or workers == 1):
+        return(_CollectFrames(map(task, tasks), len(tasks), dtype))
+    # The pool is terminated on leaving the block, also on errors.
+    with multiprocessing.Pool(workers) as pool:
+        return(_CollectFrames(pool.imap(task, tasks, chunksize), len(tasks),
+            dtype))
+
+def _FrameStats(in_files):
+    """
+    FRAME_STATS, with a 'file' field wide enough for every input file, so
+    that no file name is cut in the table.
+
+    """
+    width = max([len(in_file) for in_file in in_files], default=1)
+    return([('file', 'U{:d}'.format(width))] + FRAME_STATS[1:])
+
+def _CollectFrames(results, n_frames, dtype):
+    """
+    Gathers the (statistics, labels) tuple of each frame, in order, into a
+    table of type 'dtype'.
+
+    """
+    stats = []
+    labels = []
+    for frame_stats, lab in results:
+        stats.append(frame_stats)
+        labels.append(lab)
+        print('Analyzed {:d}/{:d} frames'.format(len(stats), n_frames),
+            end='\r', flush=True)
+    print('')
+    return(np.array(stats, dtype=dtype), labels)
+
+def main():
+    """
+    Cluster analysis of the input configuration files.
+
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('in_files', nargs='+',
+        help='Input configuration files')
+    parser.add_argument('--workers', type=int, default=None,
+        help='Number of worker processes (default: all cores)')
+    parser.add_argument('--chunksize', type=int, default=1,
+        help='Number of frames handed to a worker at once')
+    parser.add_argument('--plot', action='store_true',
+        help='Plot the clusters of each frame (runs serially)')
+    args = parser.parse_args()
+
+    stats, labels = AnalyzeFrames(args.in_files, workers=args.workers,
+        chunksize=args.chunksize, plot=args.plot)
+    print(' '.join(name for name, fmt in FRAME_STATS))
+    for row in stats:
+        print(' '.join(str(x) for x in row))
+
+if __name__ == '__main__':
     main()
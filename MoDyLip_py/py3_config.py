@@ -3,11 +3,15 @@
 
 import numpy as np
 import copy
+import json
 import os
+import struct
+import tempfile
+import zipfile
 import matplotlib.pyplot as plt
-from operator import itemgetter
 
 import py3_grid_mapping as gmp
+import py3_neighbor_index as nbi
 
 class Configuration():
     """
@@ -52,6 +56,8 @@ class Configuration():
     :param kb: Strength of the bond-angle bending potential
     :param n_chains: Number of lipids in the system: ``n``
     :param ch_len: Number of beads per lipid: ``N``
+    :param ch_arch: Type sequence of each chain architecture
+    :param arch_id: Architecture of each chain, as an index in 'ch_arch'
 
     :type box: [float]
     :type sim_time: float
@@ -65,12 +71,79 @@ class Configuration():
     :type kb: float
     :type n_chains: int
     :type ch_len: int
+    :type ch_arch: [[float]]
+    :type arch_id: ndarray([n_chains], dtype=int)
 
     """
-    def __init__(self, in_file=''):
+    # Binary sidecar written next to the input file when 'cache=True'.
+    CACHE_EXT = '.cache'
+    CACHE_MAGIC = b'MDLCFG01'
+    CACHE_ALIGN = 64
+    # Entries of the JSON header of the sidecar.
+    CACHE_KEYS = ('mtime_ns', 'size', 'time', 'box', 'vir2', 'vir3', 'l0',
+        'kb', 'ks', 'ch_len', 'Re', 'cutoff3', 'cutoff2', 'n_chains',
+        'n_beads', 'cm', 'columns', 'offset')
+    # File with the derived quantities saved by 'SaveMemo'.
+    MEMO_EXT = '.memo'
+    # Number of beads wrapped at once by 'Backfold'.
+    BACKFOLD_CHUNK = 32768
+    # Columns of the configuration body holding each bead attribute.
+    COLUMNS = {'pos': [0, 1, 2], 'vel': [3, 4, 5], 'type': [6]}
+
+    def __init__(self, in_file='', bulk=True, cache=False, compact=False,
+        columns=('pos', 'vel', 'type')):
+        """
+        :param in_file: Input configuration file
+        :param bulk: Read the configuration body in a single call to the NumPy
+            text loader, instead of the bead-by-bead loop
+        :param cache: Load the configuration from its binary sidecar
+            ('in_file' + CACHE_EXT) if it is up to date, or write it after
+            parsing the input file otherwise
+        :param compact: Store the configuration body with the compact layout
+            (see '_ToCompact')
+        :param columns: Bead attributes to be read from the input file, out
+            of 'pos', 'vel' and 'type' (see COLUMNS). Positions and types are
+            always read, since they are needed for the center of mass and the
+            chain architectures. Attributes which are not read are stored as
+            separate column arrays and loaded from the input file on first
+            access. Ignored when the body is parsed line by line ('bulk'
+            off). The sidecar cache only stores the columns which have been
+            read, so the others stay lazy after reloading it
+
+        :type in_file: str
+        :type bulk: bool
+        :type cache: bool
+        :type compact: bool
+        :type columns: (str)
+
+        """
         assert os.path.isfile(in_file), 'Can\'t open ' + in_file
-        stream = open(in_file, "r", buffering=1)
+        for name in columns:
+            assert name in self.COLUMNS, 'Invalid column \'' + name + '\''
         self.in_file = in_file
+        self.bulk = bulk
+        self.columns = tuple(name for name in self.COLUMNS
+            if name in columns or name != 'vel')
+        self._InitAttributes()
+
+        if(not (cache and self._LoadCache())):
+            stream = open(in_file, "r", buffering=1)
+            # Read control parameters.
+            self._ParseHeader(stream)
+            # Read configuration.
+            self._ParseBody(stream)
+            # Close file.
+            stream.close()
+            if(cache):
+                self._WriteCache()
+        if(compact):
+            self._ToCompact()
+
+    def _InitAttributes(self):
+        """
+        Declares header parameters and configuration body.
+
+        """
         # Header parameters.
         self.n_beads = None
         self.time = None
@@ -86,19 +159,175 @@ class Configuration():
         self.cutoff2 = None
         self.n_chains = None
         self.n_beads = None
-        # Configuration body.
-        self.cfg = None
+        # Configuration body: either a dense (n_beads, 7) array, 'cfg', or
+        # separate column arrays.
+        self.compact = False
+        self._dense = True
+        self._cfg = None
+        self._pos = None
+        self._vel = None
+        self._type = None
         self._cm = None
+        # Chain architectures, architecture of each chain and registry of
+        # architecture ids, keyed by their full type sequence.
         self.ch_arch = None
-        # Leaflet identifier.
+        self.arch_id = None
+        self._arch_index = None
+        # Leaflet identifier (labels used by the last call to 'GetSubset').
         self._leaf = None
+        # Derived quantities, keyed by name and parameters (see '_Memoize'),
+        # and in-place operations applied to the positions since loading.
+        self._memo = {}
+        self._history = []
+
+    @property
+    def cfg(self):
+        """
+        Position, velocity and type of each bead, as a (n_beads, 7) array.
+
+        When the body is stored as column arrays (compact layout or column
+        selection), this is a float64 copy assembled from the columns, so
+        in-place changes are not kept: use the column accessors ('pos', 'vel',
+        'types') instead.
 
-        # Read control parameters.
-        self._ParseHeader(stream)
-        # Read configuration.
-        self._ParseBody(stream)
-        # Close file.
-        stream.close()
+        """
+        if(self._dense):
+            return(self._cfg)
+        cfg = np.empty([self.n_beads, 7], dtype=float)
+        cfg[:, 0:3] = self.pos
+        cfg[:, 3:6] = self.vel
+        cfg[:, 6] = self.types
+        return(cfg)
+
+    @cfg.setter
+    def cfg(self, cfg):
+        assert self._dense, 'Can\'t set \'cfg\' with column arrays'
+        self._cfg = cfg
+
+    @property
+    def pos(self):
+        """
+        Bead positions: view of 'cfg[:, 0:3]', or column array (float32 with
+        the compact layout).
+
+        """
+        if(self._dense):
+            return(self._cfg[:, 0:3])
+        if(self._pos is None):
+            self._LoadColumn('pos')
+        return(self._pos)
+
+    @property
+    def vel(self):
+        """
+        Bead velocities: view of 'cfg[:, 3:6]', or column array (float32 with
+        the compact layout).
+
+        """
+        if(self._dense):
+            return(self._cfg[:, 3:6])
+        if(self._vel is None):
+            self._LoadColumn('vel')
+        return(self._vel)
+
+    @property
+    def types(self):
+        """
+        Bead types: view of 'cfg[:, 6]', or column array (int8 with the
+        compact layout).
+
+        """
+        if(self._dense):
+            return(self._cfg[:, 6])
+        if(self._type is None):
+            self._LoadColumn('type')
+        return(self._type)
+
+    def _SetColumn(self, name, data):
+        """
+        Stores the values of a bead attribute as a column array, with the
+        data type of the current layout.
+
+        :param name: Bead attribute (see COLUMNS)
+        :param data: Attribute values
+
+        :type name: str
+        :type data: ndarray([n_beads, ...], dtype=float)
+
+        """
+        if(name == 'type'):
+            dtype = np.int8 if self.compact else float
+            self._type = data.reshape(self.n_beads).astype(dtype)
+        else:
+            dtype = np.float32 if self.compact else float
+            data = data.reshape(self.n_beads, 3).astype(dtype, copy=False)
+            if(name == 'pos'):
+                self._pos = data
+            else:
+                self._vel = data
+
+    def _LoadColumn(self, name):
+        """
+        Reads a bead attribute which was left out by the column selection.
+
+        :param name: Bead attribute (see COLUMNS)
+
+        :type name: str
+
+        """
+        data = np.loadtxt(self.in_file, dtype=float, comments='#', ndmin=2,
+            usecols=self.COLUMNS[name])
+        assert len(data) == self.n_beads, 'Can\'t reload ' + self.in_file
+        self._SetColumn(name, data)
+
+    @property
+    def leaf(self):
+        """
+        Leaflet of each bead (None until leaflets have been labeled): view of
+        '_leaf[:, 0]'.
+
+        """
+        if(self._leaf is None):
+            return(None)
+        return(self._leaf[:, 0])
+
+    @property
+    def chain(self):
+        """
+        Chain index of each bead. Beads are stored chain after chain, so the
+        index is implicit and evaluated on request.
+
+        """
+        return(np.arange(self.n_beads) // self.ch_len)
+
+    def _ToCompact(self):
+        """
+        Switches the configuration body to the compact layout.
+
+        Positions and velocities are stored as float32 (n_beads, 3) arrays,
+        types as an int8 array, leaflet labels as int8 and chain indexes are
+        implicit, which takes 26 bytes per bead instead of 64 (56 for 'cfg'
+        and 8 for the leaflet label).
+
+        """
+        if(self.compact):
+            return
+        if(self._dense):
+            self._pos = self._cfg[:, 0:3]
+            self._vel = self._cfg[:, 3:6]
+            self._type = self._cfg[:, 6]
+        assert np.all(np.abs(self.types) <= np.iinfo(np.int8).max), \
+            'Bead types don\'t fit in int8'
+        self.compact = True
+        self._dense = False
+        self._cfg = None
+        # Columns left out by the column selection stay unloaded.
+        for name, data in [('pos', self._pos), ('vel', self._vel),
+            ('type', self._type)]:
+            if(data is not None):
+                self._SetColumn(name, data)
+        if(self._leaf is not None):
+            self._leaf = self._leaf.astype(np.int8)
 
     @classmethod
     def PlotConfig(self, cfg, prop='leaf', sat=0.2, size=50):
@@ -125,47 +354,161 @@ class Configuration():
         plt.show()
 
     def GetSubset(self, leaflet=None, arch=None, block=None,
-        target='single', points=[32,32], cm=False):
+        target='single', points=[32,32], cm=False, engine='mask'):
         """
         Returns a subset of beads, characterized by the leaflet, chain
         architecture and lipid sub-block.
 
+        Each row of the subset stores the bead position, type and leaflet. If
+        'cm' is set, the selected beads of each chain are replaced by their
+        center of mass.
+
+        :param engine: Selection engine: 'mask' evaluates the selection as
+            boolean arrays over all chains at once, while 'loop' checks every
+            bead in turn (reference implementation)
+
+        :type engine: str
+        :returns: Selected beads
+        :rtype: ndarray([n_selected, 5], dtype=float)
+
         """
-        # Check if leaflets have been labeled.
-        if(self._leaf is None):
-            self._LabelLeaflets(target, points)
+        # Label leaflets, unless already done with the same parameters.
+        self._LabelLeaflets(target, points)
         # Parse flag values from input parameters.
         leaf_flag, arch_flag, block_flag = self._ParseInputGetSubset(leaflet,
             arch, block)
+        if(engine == 'loop'):
+            return(self._GetSubsetLoop(leaf_flag, arch_flag, block_flag, cm))
+        assert engine == 'mask', 'Specify \'mask\' or \'loop\''
+        if(cm):
+            key = ('subset_cm', leaf_flag, arch_flag, block_flag, target,
+                tuple(points))
+            return(self._Memoize(key, lambda: self._GetSubsetMask(leaf_flag,
+                arch_flag, block_flag, cm)).copy())
+        return(self._GetSubsetMask(leaf_flag, arch_flag, block_flag, cm))
+
+    def _GetSubsetMask(self, leaf_flag, arch_flag, block_flag, cm):
+        """
+        Boolean mask implementation of 'GetSubset'.
+
+        """
+        mask = self._SubsetMask(leaf_flag, arch_flag, block_flag)
+        sel = mask.ravel()
+        sub = np.empty([np.count_nonzero(sel), 5], dtype=float)
+        sub[:, 0:3] = self.pos[sel]
+        sub[:, 3] = self.types[sel].astype(int)
+        sub[:, 4] = self._leaf[sel, 0]
+        if(cm):
+            sub = self._CoarseGrainSubsets(mask, sub)
+        return(sub)
+
+    def _CoarseGrainSubsets(self, mask, sub):
+        """
+        Evaluate the center of mass of the selected block of every chain at
+        once.
+
+        The selected beads of each chain are unfolded against the 1st selected
+        bead, under the minimum image convention, and averaged. The resulting
+        centers of mass are brought back into the simulation region around
+        the center of mass of the system.
+
+        :param mask: Selected beads, per chain
+        :param sub: Selected beads, as returned by 'GetSubset'
+
+        :type mask: ndarray([n_chains, ch_len], dtype=bool)
+        :type sub: ndarray([n_selected, 5], dtype=float)
+        :returns: One row per chain with selected beads, storing the center of
+            mass of the selection and the type and leaflet of its 1st bead
+        :rtype: ndarray([n_selected_chains, 5], dtype=float)
+
+        """
+        counts = np.count_nonzero(mask, axis=1)
+        chains = np.flatnonzero(counts)
+        counts = counts[chains]
+        mask = mask[chains]
+        pos = self.pos.reshape(self.n_chains, self.ch_len, 3)[chains]
+        first = np.argmax(mask, axis=1)
+        ref = pos[np.arange(len(chains)), first]
+        # Unfold selected beads against the 1st one.
+        dist = pos - ref[:, np.newaxis, :]
+        dist -= self.box * np.round(dist / self.box)
+        dist[~mask] = 0.
+        cm = ref + dist.sum(axis=1) / counts[:, np.newaxis]
+        # Wrap around the center of mass of the system.
+        tot_cm = np.mean(self.pos, axis=0, dtype=float)
+        upper = tot_cm + 0.5*self.box
+        lower = tot_cm - 0.5*self.box
+        cm = np.where(cm >= upper, cm - self.box,
+            np.where(cm <= lower, cm + self.box, cm))
+        # Type and leaflet of the 1st selected bead.
+        rows = np.empty([len(chains), 5], dtype=float)
+        rows[:, 0:3] = cm
+        rows[:, 3:5] = sub[np.cumsum(counts) - counts, 3:5]
+        return(rows)
+
+    def _SubsetMask(self, leaf_flag, arch_flag, block_flag):
+        """
+        Boolean selection of the beads matching the input flags.
+
+        Evaluates the conditions of '_SelectBead' over a (n_chains, ch_len)
+        view of the bead types, where the leaflet and architecture conditions
+        are evaluated once per chain and broadcast along the chain.
+
+        :returns: Selected beads, per chain
+        :rtype: ndarray([n_chains, ch_len], dtype=bool)
+
+        """
+        types = self.types.astype(int).reshape(self.n_chains, self.ch_len)
+        mask = np.ones([self.n_chains, self.ch_len], dtype=bool)
+        if(leaf_flag is not None):
+            leaf = self._leaf[::self.ch_len, 0]
+            mask &= (leaf == leaf_flag)[:, np.newaxis]
+        if(arch_flag is not None):
+            mask &= (self.arch_id == arch_flag)[:, np.newaxis]
+        if(block_flag == -1):
+            mask &= (types > 0)
+        elif(block_flag is not None):
+            mask &= (types == block_flag)
+        return(mask)
+
+    def _GetSubsetLoop(self, leaf_flag, arch_flag, block_flag, cm):
+        """
+        Bead-by-bead implementation of 'GetSubset'.
+
+        """
         sub = []
         buff = [ 5*[0] for y in range(self.ch_len)]
+        cfg = self.cfg
+        tot_cm = np.mean(cfg[:, 0:3], axis=0)
         for bd_base in range(0, self.n_beads, self.ch_len):
-            leaf_val = int(self._leaf[bd_base])
-            arch_val = int(self.cfg[bd_base, 6])
+            leaf_val = int(self._leaf[bd_base, 0])
+            arch_val = int(self.arch_id[bd_base // self.ch_len])
             buff_len = int(0)
             for bd in range(bd_base, bd_base + self.ch_len):
-                block_val = int(self.cfg[bd, 6])
+                block_val = int(cfg[bd, 6])
                 sel = self._SelectBead(
                     leaf_val, arch_val, block_val,
                     leaf_flag, arch_flag, block_flag)
                 if(sel):
-                    for k in range(3): buff[buff_len][k] = float(self.cfg[bd,k])
-                    buff[buff_len][3] = int(self.cfg[bd,6])
-                    buff[buff_len][4] = int(self._leaf[bd])
+                    for k in range(3): buff[buff_len][k] = float(cfg[bd,k])
+                    buff[buff_len][3] = int(cfg[bd,6])
+                    buff[buff_len][4] = int(self._leaf[bd, 0])
                     buff_len += 1
             if(buff_len > 0):
                 if(cm):
-                    buff, buff_len = self._CoarseGrainSubset(buff, buff_len)
+                    buff, buff_len = self._CoarseGrainSubset(buff, buff_len,
+                        tot_cm)
                 for idx in range(buff_len):
                     sub.append(copy.deepcopy(buff[idx][:]))
         return(np.array(sub))
 
-    def _CoarseGrainSubset(self, buff, buff_len):
+    def _CoarseGrainSubset(self, buff, buff_len, tot_cm):
         """
         Evaluate the center of mass of the selected block within a single chain.
 
         If necessary, the chain will be unfolded and the resulting center of
-        mass will be brought back into the simulation region.
+        mass will be brought back into the simulation region, around the
+        center of mass of the system, 'tot_cm'.
 
         """
         cm = buff[0][0:3]
@@ -178,14 +521,12 @@ class Configuration():
                 elif(dist < -0.5*self.box[k]):
                     cm[k] += self.box[k]
 
-        tot_cm = np.mean(self.cfg[:, 0:3], axis=0)
-
         for k in range(3):
             buff[0][k] = cm[k] / buff_len
-            if( cm[k] >= ( tot_cm[k] + 0.5*self.box[k] ) ):
-                cm[k] -= self.box[k]
-            elif( cm[k] <= ( tot_cm[k] - 0.5*self.box[k] ) ):
-                cm[k] += self.box[k]
+            if( buff[0][k] >= ( tot_cm[k] + 0.5*self.box[k] ) ):
+                buff[0][k] -= self.box[k]
+            elif( buff[0][k] <= ( tot_cm[k] - 0.5*self.box[k] ) ):
+                buff[0][k] += self.box[k]
 
         return(buff, 1)
 
@@ -212,7 +553,10 @@ class Configuration():
     def _ParseInputGetSubset(self, leaflet, arch, block):
         """
         Parses parameters passed in to 'GetSubset' and return the set of values
-        to be drawn from the different columns of 'self.cfg'
+        to be drawn from the different columns of 'self.cfg'. Architectures
+        are matched by their full type sequence and flagged by their id (see
+        'GetArchId'), while the head block of an architecture is flagged by
+        its 1st bead type.
 
         """
         leaf_flag = None
@@ -233,7 +577,7 @@ class Configuration():
         if(arch is None):
             arch_flag = None
         else:
-            arch_flag = int(arch[0])
+            arch_flag = self.GetArchId(arch)
         # Parse block.
         if(block is None):
             block_flag = None
@@ -248,7 +592,7 @@ class Configuration():
                     assert False, 'Invalid \'block\' option'
             else:
                 if(block == 'head'):
-                    block_flag = arch_flag
+                    block_flag = int(arch[0])
                 elif(block == 'tail'):
                     block_flag = 0
                 else:
@@ -259,38 +603,118 @@ class Configuration():
         """
         Labels chains according to its leaflet.
 
+        All chains are classified at once against the local midplane of the
+        bilayer, using either its 1st bead ('single') or its center of mass
+        ('cm'), and the label is broadcast to all the beads of the chain.
+
+        Labels are memoized for each 'target' and 'points'.
+
         """
-        try:
-            self.bilayer_cm
-        except AttributeError:
-            self.bilayer_cm = gmp.GridMap(self.cfg[:, [0,1]], self.cfg[:, 2],
-                points)
+        assert target in ('cm', 'single'), 'Specify \'cm\' or \'single\''
+        key = ('leaf', target, tuple(points))
+        self._leaf = self._Memoize(key, lambda: self._LabelChains(target,
+            points))
 
-        self._leaf = np.empty([self.n_beads,1], dtype=int)
-        point = [float] * 3
-        for bd_base in range(0, self.n_beads, self.ch_len):
-            if(target == 'cm'):
-                for k in range(3): point[k] = 0.
-                for bd in range(bd_base, bd_base + self.ch_len):
-                    for k in range(3): point[k] += self.cfg[bd, k] / self.ch_len
-            elif(target == 'single'):
-                for k in range(3): point[k] = self.cfg[bd_base, k]
-            else:
-                assert False, 'Specify \'cm\' or \'single\''
-            val = self.bilayer_cm.ClassifyPoint(point)
-            for bd in range(bd_base, bd_base + self.ch_len):
-                self._leaf[bd] = val
+    def _LabelChains(self, target, points):
+        """
+        Leaflet of each bead, as evaluated by '_LabelLeaflets'.
+
+        :rtype: ndarray([n_beads, 1], dtype=int)
+
+        """
+        pos = self.pos.reshape(self.n_chains, self.ch_len, 3)
+        if(target == 'cm'):
+            point = pos.mean(axis=1)
+        else:
+            point = pos[:, 0, :]
+        val = self.GetBilayerMap(points).ClassifyPoints(point)
+        leaf = np.repeat(val, self.ch_len).reshape(self.n_beads, 1)
+        if(self.compact):
+            leaf = leaf.astype(np.int8)
+        return(leaf)
+
+    def GetBilayerMap(self, points=[32,32]):
+        """
+        Height of the bilayer midplane over the XY plane, sampled on a grid
+        of 'points' bins. Memoized for each 'points'.
+
+        :type points: [int]
+        :rtype: GridMap
 
-    def Backfold(self):
         """
-        Wraps particles into the simulation box.
+        return(self._Memoize(('bilayer_cm', tuple(points)),
+            lambda: gmp.GridMap(self.pos[:, [0,1]], self.pos[:, 2], points)))
 
+    def _Memoize(self, key, func):
         """
+        Returns the derived quantity stored under 'key', evaluating it with
+        'func' on the 1st request.
+
+        Keys are tuples with the name of the quantity followed by the
+        parameters it depends on. All the stored quantities are dropped by
+        '_Invalidate' whenever the positions are modified in place.
+
+        :type key: tuple
+        :type func: callable
+
+        """
+        if(key not in self._memo):
+            self._memo[key] = func()
+        return(self._memo[key])
+
+    def _Invalidate(self, operation=None):
+        """
+        Drops all the memoized quantities, and records the in-place operation
+        applied to the positions, if any.
+
+        :type operation: tuple
+
+        """
+        self._memo.clear()
+        if(operation is not None):
+            self._history.append(operation)
+
+    def Backfold(self, by='bead'):
+        """
+        Wraps particles into the simulation box, centered at the center of
+        mass of the configuration.
+
+        :param by: Wrapping unit: 'bead' wraps every bead on its own, while
+            'chain' unfolds each chain against its 1st bead, under the minimum
+            image convention, and wraps it as a whole according to its center
+            of mass, so that chains are not split across the boundaries of
+            the simulation box
+
+        :type by: str
+
+        """
+        self._Invalidate(('Backfold', by))
         orig = self._cm - 0.5*self.box
-        for row in range(self.n_beads):
-            for col in range(3):
-                rel_pos = self.cfg[row, col] - orig[col]
-                self.cfg[row, col] = np.mod(rel_pos, self.box[col]) + orig[col]
+        pos = self.pos
+        if(by == 'bead'):
+            # Shift by whole boxes, in blocks of at most BACKFOLD_CHUNK beads
+            # through a single scratch buffer.
+            inv_box = 1. / self.box
+            scratch = np.empty([min(self.BACKFOLD_CHUNK, self.n_beads), 3])
+            for start in range(0, self.n_beads, self.BACKFOLD_CHUNK):
+                block = pos[start:start + self.BACKFOLD_CHUNK]
+                shift = scratch[:len(block)]
+                np.subtract(block, orig, out=shift)
+                shift *= inv_box
+                np.floor(shift, out=shift)
+                shift *= self.box
+                block -= shift
+        elif(by == 'chain'):
+            chains = pos.reshape(self.n_chains, self.ch_len, 3)
+            ref = chains[:, 0:1, :]
+            dist = chains - ref
+            dist -= self.box * np.round(dist / self.box)
+            cm = ref[:, 0, :] + dist.mean(axis=1)
+            ref = ref - self.box * np.floor((cm - orig) / self.box)[:,
+                np.newaxis, :]
+            pos[:] = (ref + dist).reshape(self.n_beads, 3)
+        else:
+            assert False, 'Specify \'bead\' or \'chain\''
 
     def MoveTo(self, location=[0., 0., 0.]):
         """
@@ -303,16 +727,127 @@ class Configuration():
         """
         shift = location - self._cm
         if(np.linalg.norm(shift) > 1.e-3):
-            self.cfg[:, 0:3] += shift
+            self.pos[:] += shift
+            self._cm = self._cm + shift
+            self._Invalidate(('MoveTo', tuple(float(x) for x in location)))
+
+    def GetNeighborIndex(self, leaflet=None, arch=None, block=None,
+        target='single', points=[32,32], cm=False):
+        """
+        Periodic neighbor index over the bead positions, or over the rows of
+        a subset (see 'GetSubset', with the same parameters).
+
+        The index is built on the 1st call for each selection and shared by
+        later calls, e.g., by every analysis clustering the same subset of a
+        frame, until the positions are modified by 'Backfold' or 'MoveTo'.
+
+        :rtype: NeighborIndex
+
+        """
+        if((leaflet is None) and (arch is None) and (block is None) and
+            (not cm)):
+            return(self._Memoize(('neighbors',),
+                lambda: nbi.NeighborIndex(self.pos, self.box)))
+        leaf_flag, arch_flag, block_flag = self._ParseInputGetSubset(leaflet,
+            arch, block)
+        key = ('neighbors', leaf_flag, arch_flag, block_flag, target,
+            tuple(points), cm)
+        return(self._Memoize(key, lambda: nbi.NeighborIndex(
+            self.GetSubset(leaflet, arch, block, target, points, cm)[:, 0:3],
+            self.box)))
 
     def GetCenterOfMass(self):
         """
         Evaluates and returns the configuration center of mass.
 
         """
-        self._cm = np.mean(self.cfg[:, 0:3], axis=0)
+        self._cm = self._Memoize(('cm',),
+            lambda: np.mean(self.pos, axis=0, dtype=float))
         return(self._cm)
 
+    def _MemoFile(self):
+        """
+        Name of the file storing the memoized quantities of the input
+        configuration.
+
+        """
+        return(self.in_file + self.MEMO_EXT)
+
+    def SaveMemo(self):
+        """
+        Saves the memoized arrays (leaflet labels, coarse-grained subsets,
+        center of mass) next to the input file, so that later sessions can
+        reload them with 'LoadMemo'.
+
+        The arrays are stored with np.savez, together with a JSON record of
+        their keys, the mtime and size of the input file and the in-place
+        operations applied to the positions ('Backfold', 'MoveTo'), since the
+        stored quantities are only valid for the same input file after the
+        same operations. The file is first written to a temporary file in the
+        same directory and then renamed, so that concurrent readers never see
+        a partially written file.
+
+        """
+        stat = os.stat(self.in_file)
+        keys = []
+        arrays = {}
+        for key, val in self._memo.items():
+            if(isinstance(val, np.ndarray)):
+                arrays['memo_{:d}'.format(len(keys))] = val
+                keys.append(key)
+        state = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'history': self._history, 'keys': keys}
+        arrays['state'] = np.array(json.dumps(state, default=int))
+        memo_file = self._MemoFile()
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(memo_file)),
+            suffix=self.MEMO_EXT)
+        with os.fdopen(fd, 'wb') as stream:
+            np.savez(stream, **arrays)
+        os.replace(tmp_file, memo_file)
+
+    def LoadMemo(self):
+        """
+        Loads the quantities saved by 'SaveMemo', if the input file and the
+        in-place operations applied to the positions are the same.
+
+        Returns False, leaving the memoized quantities untouched, if the file
+        is missing, unreadable or stale.
+
+        :returns: Whether the quantities have been loaded
+        :rtype: bool
+
+        """
+        memo_file = self._MemoFile()
+        if(not os.path.isfile(memo_file)):
+            return(False)
+        stat = os.stat(self.in_file)
+        try:
+            with np.load(memo_file) as data:
+                state = json.loads(str(data['state']))
+                if((state['mtime_ns'] != stat.st_mtime_ns) or
+                    (state['size'] != stat.st_size) or
+                    (list(self._AsTuple(state['history'])) != self._history)):
+                    return(False)
+                memo = {self._AsTuple(key): data['memo_{:d}'.format(idx)]
+                    for idx, key in enumerate(state['keys'])}
+        except (OSError, EOFError, ValueError, KeyError, TypeError,
+            zipfile.BadZipFile):
+            return(False)
+        self._memo.update(memo)
+        return(True)
+
+    @classmethod
+    def _AsTuple(self, val):
+        """
+        Turns the JSON lists of a memo file back into tuples, as used in
+        the memo keys and the history of in-place operations.
+
+        """
+        if(isinstance(val, list)):
+            return(tuple(self._AsTuple(x) for x in val))
+        return(val)
+
     def _ParseBody(self, stream):
         """
         Read particles' position, velocity and type.
@@ -323,6 +858,9 @@ class Configuration():
         architectures (returned in self.ch_arch) and the center of mass of the
         system (returned in self._cm).
 
+        The whole body is tokenized in a single call to the NumPy text loader,
+        unless the bead-by-bead parser has been requested ('bulk=False').
+
         :param stream: Data stream to the input configuration file
         :param cfg: Array of shape (n_beads, 7) storing the three coordinated
             positions and velocities of each particles and its type
@@ -334,11 +872,52 @@ class Configuration():
         :type ch_arch: []
         :type _cm: ndarray([3], dtype=float)
 
+        """
+        if(not self.bulk):
+            self._ParseBodyLoop(stream)
+            return
+        # Rewind array.
+        stream.seek(0)
+        if(len(self.columns) == len(self.COLUMNS)):
+            self.cfg = np.loadtxt(stream, dtype=float, comments='#', ndmin=2)
+            assert self.cfg.shape[1] == 7, 'Body should have 7 columns'
+            assert self.n_beads == len(self.cfg), \
+                'n_beads != n_chains * ch_len'
+        else:
+            # Tokenize the selected columns only.
+            usecols = [col for name in self.columns
+                for col in self.COLUMNS[name]]
+            data = np.loadtxt(stream, dtype=float, comments='#', ndmin=2,
+                usecols=usecols)
+            assert self.n_beads == len(data), 'n_beads != n_chains * ch_len'
+            self._dense = False
+            start = 0
+            for name in self.columns:
+                stop = start + len(self.COLUMNS[name])
+                self._SetColumn(name, data[:, start:stop])
+                start = stop
+        self._cm = np.mean(self.pos, axis=0)
+        self._IdentifyChainArchs()
+        print('Chain architectures')
+        for ch in self.ch_arch: print(ch)
+
+    def _ParseBodyLoop(self, stream):
+        """
+        Read particles' position, velocity and type, one bead at a time.
+
+        Reference implementation of '_ParseBody', with equivalent outputs,
+        selected with 'bulk=False'.
+
+        :param stream: Data stream to the input configuration file
+
+        :type stream: File object
+
         """
         # Declarations.
-        self.cfg = np.empty([self.n_beads, 7], dtype=np.float)
-        self._cm = np.zeros(3, dtype=np.float)
-        self.ch_arch = []
+        self.cfg = np.empty([self.n_beads, 7], dtype=float)
+        self._cm = np.zeros(3, dtype=float)
+        self._arch_index = {}
+        arch_id = []
         buff = [float(0)] * self.ch_len
         # Rewind array.
         stream.seek(0)
@@ -361,7 +940,7 @@ class Configuration():
                 buff[bead] = self.cfg[row, 6]
                 bead += 1
                 if(bead == self.ch_len):
-                    self._IdentifyChainArch(buff)
+                    arch_id.append(self._IdentifyChainArch(buff))
                     bead = 0
                 # Read the next bead.
                 row += 1
@@ -369,32 +948,217 @@ class Configuration():
                 continue
         assert self.n_beads == row, 'n_beads != n_chains * ch_len'
         self._cm /= self.n_beads
-        # Sort chain architectures by their 1st head-group bead.
+        # Sort chain architectures by their type sequence.
+        archs = sorted(self._arch_index, key=self._arch_index.get)
+        self._SetChainArchs(np.array(archs, dtype=float), np.array(arch_id))
         print('Chain architectures')
-        self.ch_arch.sort(key=itemgetter(0))
         for ch in self.ch_arch: print(ch)
 
+    def _IdentifyChainArchs(self):
+        """
+        Identifies all chain architectures in 'cfg' at once.
+
+        Chains are told apart by their full type sequence. The type sequence
+        of each chain is packed into a single opaque key, so that all the keys
+        are deduplicated with a single sort.
+
+        """
+        types = self.types.reshape(self.n_chains, self.ch_len)
+        keys = np.ascontiguousarray(types, dtype=np.int64)
+        keys = keys.view(np.dtype((np.void, keys.itemsize * self.ch_len)))
+        keys, first, arch_id = np.unique(keys.ravel(), return_index=True,
+            return_inverse=True)
+        self._SetChainArchs(types[first], arch_id)
+
     def _IdentifyChainArch(self, buff):
         """
-        Identifies new chain architectures in the passed in buffer and appends
-        them to ch_arch.
+        Registers the architecture of a single chain, if new, and returns its
+        provisional id (order of appearance).
 
         :param buff: Input chain architecture
-        :param ch_arch: List storing all the different chain architectures.
 
         :type buff: [float]
-        :type ch_arch: [[float]]
+        :rtype: int
+
+        """
+        key = tuple(int(x) for x in buff)
+        return(self._arch_index.setdefault(key, len(self._arch_index)))
+
+    def _SetChainArchs(self, archs, arch_id):
+        """
+        Sorts the chain architectures by their type sequence, and sets
+        'ch_arch', the architecture id of each chain and the registry of
+        architecture ids.
+
+        :param archs: Type sequence of each architecture
+        :param arch_id: Index in 'archs' of the architecture of each chain
+
+        :type archs: ndarray([n_archs, ch_len])
+        :type arch_id: ndarray([n_chains], dtype=int)
+
+        """
+        order = np.lexsort(archs.T[::-1])
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        archs = archs[order]
+        self.ch_arch = [ch.tolist() for ch in archs]
+        self.arch_id = rank[arch_id.ravel()]
+        self._arch_index = {tuple(int(x) for x in ch): idx
+            for idx, ch in enumerate(archs)}
+
+    def GetArchId(self, arch):
+        """
+        Id of a chain architecture, i.e., its index in 'ch_arch'.
+
+        :param arch: Type sequence of the architecture
+        :type arch: [float]
+        :rtype: int
+
+        """
+        key = tuple(int(x) for x in arch)
+        assert key in self._arch_index, 'Unknown chain architecture'
+        return(self._arch_index[key])
+
+    def _CacheFile(self):
+        """
+        Name of the binary sidecar of the input configuration file.
+
+        """
+        return(self.in_file + self.CACHE_EXT)
+
+    def _LoadCache(self):
+        """
+        Load header and body from the binary sidecar of the input file.
+
+        The sidecar starts with CACHE_MAGIC, followed by the length of a JSON
+        header (little-endian uint64) and the header itself. The body, i.e.,
+        the columns listed in the header ('columns', see COLUMNS), is stored as
+        raw float64 values at the first CACHE_ALIGN-aligned offset after the
+        header, and is mapped copy-on-write with np.memmap:
+        processes loading the same frame share its page cache, while
+        in-place operations ('Backfold', 'MoveTo') never modify the sidecar.
+        Columns left out by the column selection are not stored, and are
+        loaded from the input file on first access.
+
+        Returns False, leaving the object untouched, if the sidecar is
+        missing, malformed or stale, i.e., if the mtime or size of the input
+        file differ from the ones recorded when it was written.
+
+        :returns: Whether the configuration has been loaded
+        :rtype: bool
+
+        """
+        cache_file = self._CacheFile()
+        if(not os.path.isfile(cache_file)):
+            return(False)
+        stat = os.stat(self.in_file)
+        try:
+            with open(cache_file, 'rb') as stream:
+                magic = stream.read(len(self.CACHE_MAGIC))
+                if(magic != self.CACHE_MAGIC):
+                    return(False)
+                head_len, = struct.unpack('<Q', stream.read(8))
+                blob = stream.read(head_len)
+                if(len(blob) != head_len):
+                    return(False)
+                head = json.loads(blob.decode('utf-8'))
+            missing = [key for key in self.CACHE_KEYS if key not in head]
+            if(len(missing) > 0):
+                return(False)
+            columns = head['columns']
+            if(('pos' not in columns) or ('type' not in columns) or
+                any(name not in self.COLUMNS for name in columns)):
+                return(False)
+            width = sum(len(self.COLUMNS[name]) for name in columns)
+            # Truncated sidecars can't be mapped.
+            body = 8*width*head['n_beads']
+            if(os.path.getsize(cache_file) < head['offset'] + body):
+                return(False)
+        except (struct.error, ValueError, TypeError):
+            return(False)
+        if((head['mtime_ns'] != stat.st_mtime_ns) or
+            (head['size'] != stat.st_size)):
+            return(False)
+        self.time = head['time']
+        self.box = np.array(head['box'])
+        self.vir2 = np.array(head['vir2'])
+        self.vir3 = np.array(head['vir3'])
+        self.l0 = head['l0']
+        self.kb = head['kb']
+        self.ks = head['ks']
+        self.ch_len = head['ch_len']
+        self.Re = head['Re']
+        self.cutoff3 = head['cutoff3']
+        self.cutoff2 = head['cutoff2']
+        self.n_chains = head['n_chains']
+        self.n_beads = head['n_beads']
+        self._cm = np.array(head['cm'])
+        data = np.memmap(cache_file, dtype='<f8', mode='c',
+            offset=head['offset'], shape=(self.n_beads, width))
+        if(len(columns) == len(self.COLUMNS)):
+            self.cfg = data
+        else:
+            self._dense = False
+            start = 0
+            for name in columns:
+                stop = start + len(self.COLUMNS[name])
+                self._SetColumn(name, data[:, start:stop])
+                start = stop
+        self._IdentifyChainArchs()
+        return(True)
+
+    def _WriteCache(self):
+        """
+        Write header and body to the binary sidecar of the input file.
+
+        The sidecar is first written to a temporary file in the same
+        directory and then renamed, so that concurrent readers never see a
+        partially written sidecar. See '_LoadCache' for the layout.
 
         """
-        num_archs = len(self.ch_arch)
-        if(num_archs == 0):
-            self.ch_arch.append(copy.deepcopy(buff))
+        # Columns which have been read, without loading the others.
+        if(self._dense):
+            columns = list(self.COLUMNS)
+            body = self._cfg
         else:
-            mismatch = 0
-            for ch in self.ch_arch:
-                if(buff[0] != ch[0]): mismatch += 1
-            if(mismatch == num_archs):
-                self.ch_arch.append(copy.deepcopy(buff))
+            loaded = {'pos': self._pos, 'vel': self._vel, 'type': self._type}
+            columns = [name for name in self.COLUMNS
+                if loaded[name] is not None]
+            body = np.column_stack([loaded[name].reshape(self.n_beads, -1)
+                for name in columns])
+        stat = os.stat(self.in_file)
+        head = {
+            'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'time': self.time, 'box': self.box.tolist(),
+            'vir2': self.vir2.tolist(), 'vir3': self.vir3.tolist(),
+            'l0': self.l0, 'kb': self.kb, 'ks': self.ks,
+            'ch_len': self.ch_len, 'Re': self.Re,
+            'cutoff3': self.cutoff3, 'cutoff2': self.cutoff2,
+            'n_chains': self.n_chains, 'n_beads': self.n_beads,
+            'cm': self._cm.tolist(), 'columns': columns, 'offset': 0}
+        # The offset is part of the header, so iterate until it is stable.
+        prefix = len(self.CACHE_MAGIC) + 8
+        while True:
+            blob = json.dumps(head).encode('utf-8')
+            offset = prefix + len(blob)
+            offset += -offset % self.CACHE_ALIGN
+            if(offset == head['offset']):
+                break
+            head['offset'] = offset
+        cache_dir = os.path.dirname(os.path.abspath(self.in_file))
+        try:
+            fd, tmp_file = tempfile.mkstemp(dir=cache_dir,
+                suffix=self.CACHE_EXT)
+        except OSError:
+            print('Can\'t write cache for ' + self.in_file)
+            return
+        with os.fdopen(fd, 'wb') as stream:
+            stream.write(self.CACHE_MAGIC)
+            stream.write(struct.pack('<Q', len(blob)))
+            stream.write(blob)
+            stream.write(b'\0' * (offset - prefix - len(blob)))
+            np.ascontiguousarray(body, dtype='<f8').tofile(stream)
+        os.replace(tmp_file, self._CacheFile())
 
     def _ParseHeader(self, stream):
         """
@@ -55,21 +55,23 @@ class GridMap():
         :type target: ndarrat([n_samples], dtype=float)
 
         """
-        # Gird dimensions and boundaries.
-        self.start = domain.min(axis=0)
-        self.width = (domain.max(axis=0) - self.start) / self.points
-        # Evaluate mapping.
-        counts = np.zeros((self.points[0]+1, self.points[1]+1), dtype=int)
-        self.map = np.zeros((self.points[0]+1, self.points[1]+1), dtype=float)
-        for sample in range(len(target)):
-            i = int((domain[sample,0] - self.start[0]) / self.width[0])
-            j = int((domain[sample,1] - self.start[1]) / self.width[1])
-            counts[i,j] += 1
-            self.map[i,j] += target[sample]
+        # Gird dimensions and boundaries, reduced column by column (much
+        # faster than reducing a (n_samples, 2) array along axis=0).
+        self.start = np.array([domain[:,k].min() for k in range(2)])
+        stop = np.array([domain[:,k].max() for k in range(2)])
+        self.width = (stop - self.start) / self.points
+        # Evaluate mapping: accumulate counts and target values over the
+        # flattened bin indices.
+        shape = (self.points[0]+1, self.points[1]+1)
+        i = ((domain[:,0] - self.start[0]) / self.width[0]).astype(int)
+        j = ((domain[:,1] - self.start[1]) / self.width[1]).astype(int)
+        bins = i*shape[1] + j
+        size = shape[0] * shape[1]
+        counts = np.bincount(bins, minlength=size).reshape(shape)
+        self.map = np.bincount(bins, weights=target,
+            minlength=size).reshape(shape)
         # Normalize.
-        for i in range(self.points[0] + 1):
-            for j in range(self.points[1] + 1):
-                if(counts[i,j] != 0): self.map[i,j] /= float(counts[i,j])
+        np.divide(self.map, counts, out=self.map, where=(counts != 0))
 
     def ClassifyPoint(self, point):
         """
@@ -86,6 +88,23 @@ class GridMap():
         else:
             return 0
 
+    def ClassifyPoints(self, points):
+        """
+        Vectorized version of 'ClassifyPoint' for an array of points.
+
+        :param points: Points to be classified
+
+        :type points: ndarray([n_points, 3], dtype=float)
+        :returns: 1 for points lying above the local average normal, 0
+            otherwise
+        :rtype: ndarray([n_points], dtype=int)
+
+        """
+        # Find slabs.
+        i = ((points[:, 0] - self.start[0]) / self.width[0]).astype(int)
+        j = ((points[:, 1] - self.start[1]) / self.width[1]).astype(int)
+        return((points[:, 2] >= self.map[i, j]).astype(int))
+
     def Plot(self):
         """
         Density plot of the coarse-grained quantity.
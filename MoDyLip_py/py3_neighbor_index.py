@@ -0,0 +1,119 @@
+# #!/usr/bin/python3
+# #encoding-utf8
+
+import numpy as np
+from scipy import sparse
+from scipy.spatial import cKDTree
+
+import py3_periodic_metric as metric
+
+class NeighborIndex():
+    """
+    Neighbor index over a set of points in a periodic box, backed by a
+    periodic KD-tree.
+
+    The index is meant to be built once per frame and shared by all the
+    analyses on that frame (see 'Configuration.GetNeighborIndex'). It answers
+    radius queries, k-nearest neighbor queries and pair lists, under the
+    minimum image convention::
+
+        index = NeighborIndex(points, box)
+        neigh = index.RadiusQuery(points[:10], 1.5)
+        dist, idx = index.KNearest(points, 6)
+        pairs = index.Pairs(1.5)
+
+    .. Attributes:
+
+    :param points: Indexed points
+    :param box: Dimensions of the periodic box
+    :param metric: Minimum image metric of the box
+    :param tree: Periodic KD-tree over the points, wrapped into [0, box)
+
+    :type points: ndarray([n_points, dim], dtype=float)
+    :type box: ndarray([dim], dtype=float)
+    :type metric: PeriodicMetric
+    :type tree: scipy.spatial.cKDTree
+
+    """
+    def __init__(self, points, box):
+        """
+        :param points: Points to be indexed, anywhere in space (they are
+            wrapped into the box)
+        :param box: Dimensions of the periodic box
+
+        :type points: ndarray([n_points, dim], dtype=float)
+        :type box: [float]
+
+        """
+        self.box = np.asarray(box, dtype=float)
+        assert points.shape[1] == len(self.box), 'Unequal dimensions!!!'
+        self.points = points
+        self.metric = metric.PeriodicMetric(self.box)
+        self.tree = cKDTree(self._Wrap(points), boxsize=self.box)
+
+    def _Wrap(self, points):
+        """
+        Wraps points into [0, box), as required by the periodic KD-tree.
+
+        """
+        wrapped = np.mod(points, self.box)
+        # np.mod may round tiny negative coordinates up to box.
+        wrapped[wrapped >= self.box] = 0.
+        return(wrapped)
+
+    def RadiusQuery(self, x, radius):
+        """
+        Indexes of the points within 'radius' of each of the points 'x'.
+
+        :type x: ndarray([n_x, dim], dtype=float)
+        :type radius: float
+        :returns: Sorted indexes of the neighbors of each point in 'x'
+        :rtype: [[int]]
+
+        """
+        return(list(self.tree.query_ball_point(self._Wrap(x), radius,
+            return_sorted=True)))
+
+    def KNearest(self, x, k):
+        """
+        The 'k' points nearest to each of the points 'x' (which includes the
+        point itself when 'x' has been indexed).
+
+        :type x: ndarray([n_x, dim], dtype=float)
+        :type k: int
+        :returns: Distances and indexes of the neighbors, sorted by distance
+        :rtype: ndarray([n_x, k], dtype=float), ndarray([n_x, k], dtype=int)
+
+        """
+        dist, idx = self.tree.query(self._Wrap(x), k=list(range(1, k + 1)))
+        return(dist, idx)
+
+    def Pairs(self, radius):
+        """
+        Pairs of indexed points closer than 'radius', with 'i < j'.
+
+        :type radius: float
+        :rtype: ndarray([n_pairs, 2], dtype=int)
+
+        """
+        return(self.tree.query_pairs(radius, output_type='ndarray'))
+
+    def RadiusGraph(self, radius):
+        """
+        Symmetric sparse matrix with the distances between all pairs of
+        indexed points closer than 'radius'. The diagonal is not stored.
+
+        :type radius: float
+        :rtype: scipy.sparse.csr_matrix([n_points, n_points], dtype=float)
+
+        """
+        pairs = self.Pairs(radius)
+        i = pairs[:, 0]
+        j = pairs[:, 1]
+        disp = self.metric.Displacement(self.points[i], self.points[j])
+        dist = np.sqrt(np.einsum('ij,ij->i', disp, disp))
+        n_points = len(self.points)
+        return(sparse.csr_matrix(
+            (np.concatenate([dist, dist]),
+            (np.concatenate([i, j]), np.concatenate([j, i]))),
+            shape=(n_points, n_points)))
@@ -5,22 +5,84 @@ import numpy as np
 
 class PeriodicMetric():
     """
+    Euclidean metric in a periodic box, under the minimum image convention.
+
+    Separations along each direction are folded into [-box/2, box/2], for
+    both positive and negative separations. All methods accept arrays of
+    points, with coordinates along the last axis.
+
+    .. Attributes:
+
+    :param box: Dimensions of the periodic box
+    :param halfBox: Half the dimensions of the periodic box
+    :param dim: Number of dimensions
+
+    :type box: ndarray([dim], dtype=float)
+    :type halfBox: ndarray([dim], dtype=float)
+    :type dim: int
 
     """
     def __init__(self, box):
-        self.halfBox = 0.5*box
+        self.box = np.asarray(box, dtype=float)
+        self.halfBox = 0.5*self.box
         self.dim = int(len(box))
 
+    def Displacement(self, x, y):
+        """
+        Minimum image displacement from 'x' to 'y'.
+
+        :type x: ndarray([..., dim], dtype=float)
+        :type y: ndarray([..., dim], dtype=float)
+        :rtype: ndarray([..., dim], dtype=float)
+
+        """
+        disp = np.subtract(y, x, dtype=float)
+        disp -= self.box * np.round(disp / self.box)
+        return(disp)
+
     def Distance(self, x, y):
-        dist = 0.
-        for idx in range(self.dim):
-            temp = (y[idx] - x[idx])
-            if(temp > self.halfBox[idx]):
-                dist += (temp - 2.*self.halfBox[idx])**2
-            else:
-                dist += (temp)**2
-        # Normalize.
-        return(np.sqrt(dist))
+        """
+        Minimum image distance between the points 'x' and 'y'.
 
+        :type x: ndarray([dim], dtype=float)
+        :type y: ndarray([dim], dtype=float)
+        :rtype: float
 
+        """
+        disp = self.Displacement(x, y)
+        return(np.sqrt(np.dot(disp, disp)))
 
+    def Distances(self, x, y):
+        """
+        Minimum image distances from the point 'x' to every point in 'y'.
+
+        :type x: ndarray([dim], dtype=float)
+        :type y: ndarray([n_points, dim], dtype=float)
+        :rtype: ndarray([n_points], dtype=float)
+
+        """
+        disp = self.Displacement(x, y)
+        return(np.sqrt(np.einsum('ij,ij->i', disp, disp)))
+
+    def PairwiseDistances(self, x, y=None):
+        """
+        Minimum image distances between every point in 'x' and every point
+        in 'y' (by default, 'x' itself).
+
+        The distance matrix is accumulated one direction at a time, so that
+        no (n_x, n_y, dim) temporary is allocated.
+
+        :type x: ndarray([n_x, dim], dtype=float)
+        :type y: ndarray([n_y, dim], dtype=float)
+        :rtype: ndarray([n_x, n_y], dtype=float)
+
+        """
+        if(y is None):
+            y = x
+        dist = np.zeros([len(x), len(y)], dtype=float)
+        for idx in range(self.dim):
+            disp = np.subtract.outer(x[:, idx], y[:, idx])
+            disp -= self.box[idx] * np.round(disp / self.box[idx])
+            disp *= disp
+            dist += disp
+        return(np.sqrt(dist, out=dist))
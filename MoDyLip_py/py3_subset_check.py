@@ -0,0 +1,128 @@
+# #!/usr/bin/python3
+# #encoding-utf8
+
+import argparse
+import itertools
+import sys
+import time
+import numpy as np
+
+import py3_config as conf
+
+def SubsetCases(cfg):
+    """
+    Every combination of leaflet, chain architecture, block and coarse
+    graining accepted by 'Configuration.GetSubset' for the input
+    configuration.
+
+    :type cfg: Configuration
+    :rtype: [dict]
+
+    """
+    leaflets = [None, 'upper', 'lower']
+    archs = [None] + list(cfg.ch_arch)
+    blocks = [None, 'head', 'tail']
+    return([dict(leaflet=leaflet, arch=arch, block=block, cm=cm)
+        for leaflet, arch, block, cm in itertools.product(leaflets, archs,
+        blocks, [False, True])])
+
+def _DropSubsets(cfg):
+    """
+    Drops the memoized coarse-grained subsets, so that every call to
+    'GetSubset' evaluates the selection again.
+
+    """
+    for key in [key for key in cfg._memo if key[0] == 'subset_cm']:
+        del cfg._memo[key]
+
+def CheckSubsetEngines(cfg, atol=1.e-9):
+    """
+    Compares the subsets returned by the mask engine against the
+    bead-by-bead reference ('engine="loop"'), for every case of
+    'SubsetCases'.
+
+    Both engines must select the same rows, in the same order. Plain subsets
+    must be identical, while coarse-grained ones may differ by rounding in
+    the center of mass, up to 'atol'.
+
+    :type cfg: Configuration
+    :type atol: float
+    :returns: Cases whose subsets differ
+    :rtype: [dict]
+
+    """
+    failed = []
+    for case in SubsetCases(cfg):
+        _DropSubsets(cfg)
+        mask = cfg.GetSubset(engine='mask', **case)
+        loop = np.asarray(cfg.GetSubset(engine='loop', **case), dtype=float)
+        loop = loop.reshape(-1, 5)
+        if(mask.shape != loop.shape):
+            failed.append(case)
+        elif(case['cm']):
+            if(not np.allclose(mask, loop, rtol=0., atol=atol)):
+                failed.append(case)
+        elif(not np.array_equal(mask, loop)):
+            failed.append(case)
+    return(failed)
+
+def TimeSubsetEngines(cfg, case=None, repeat=3):
+    """
+    Best wall time, out of 'repeat' calls, of each 'GetSubset' engine for a
+    single case, by default the coarse-grained head groups of the upper
+    leaflet and the 1st chain architecture. Leaflets are labeled once,
+    before timing.
+
+    :type cfg: Configuration
+    :type case: dict
+    :type repeat: int
+    :returns: Wall time of each engine, in seconds
+    :rtype: {str: float}
+
+    """
+    if(case is None):
+        case = dict(leaflet='upper', arch=cfg.ch_arch[0], block='head',
+            cm=True)
+    cfg.GetSubset()
+    timing = {}
+    for engine in ('loop', 'mask'):
+        best = np.inf
+        for idx in range(repeat):
+            _DropSubsets(cfg)
+            start = time.perf_counter()
+            cfg.GetSubset(engine=engine, **case)
+            best = min(best, time.perf_counter() - start)
+        timing[engine] = best
+    return(timing)
+
+def main():
+    """
+    Equivalence check and benchmark of the 'GetSubset' engines, on the input
+    configuration files.
+
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument('in_files', nargs='+',
+        help='Input configuration files')
+    parser.add_argument('--repeat', type=int, default=3,
+        help='Number of timed calls per engine (best is reported)')
+    args = parser.parse_args()
+
+    status = 0
+    for in_file in args.in_files:
+        cfg = conf.Configuration(in_file)
+        cases = SubsetCases(cfg)
+        failed = CheckSubsetEngines(cfg)
+        print('{:s}: {:d} beads, {:d}/{:d} cases equal'.format(in_file,
+            cfg.n_beads, len(cases) - len(failed), len(cases)))
+        for case in failed:
+            print('  differs: {}'.format(case))
+        timing = TimeSubsetEngines(cfg, repeat=args.repeat)
+        print('  loop {:.4f} s, mask {:.4f} s ({:.0f}x)'.format(
+            timing['loop'], timing['mask'], timing['loop'] / timing['mask']))
+        if(len(failed) > 0):
+            status = 1
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+# #!/usr/bin/python3
+# #encoding-utf8
+
+import numpy as np
+import io
+import os
+from itertools import islice
+
+import py3_config as conf
+
+def ScanFrames(in_file):
+    """
+    Byte offset of every frame in a configuration file, from a quick scan of
+    its lines: headers are parsed for the number of beads, and body lines
+    are counted but not tokenized. Each frame can then be read on its own
+    (see 'Trajectory.ReadFrameAt'), e.g., by different processes.
+
+    :param in_file: Input configuration file, with one or several frames
+
+    :type in_file: str
+    :rtype: [int]
+
+    """
+    offsets = []
+    header = []
+    n_beads = 0
+    row = 0
+    offset = 0
+    with open(in_file, 'rb') as stream:
+        for line in stream:
+            comment = line.startswith(b'#')
+            blank = (line.strip() == b'')
+            if(row < n_beads):
+                if(not (comment or blank)): row += 1
+            elif(comment):
+                if(len(header) == 0): offsets.append(offset)
+                header.append(line)
+            elif(not blank):
+                # 1st bead of the frame.
+                assert len(header) > 0, 'Missing header in ' + in_file
+                n_beads = _CountBeads(header, in_file)
+                header = []
+                row = 1
+            offset += len(line)
+    assert (len(header) == 0) and (row == n_beads), \
+        'Truncated frame in ' + in_file
+    return(offsets)
+
+def _CountBeads(header, in_file):
+    """
+    Number of beads of a frame, n*N, from its header lines (see
+    'Configuration').
+
+    """
+    fields = {}
+    for line in header:
+        for token in line.decode('utf-8').lstrip('#').split():
+            name, sep, val = token.partition('=')
+            if(sep and (name in ('n', 'N')) and (name not in fields)):
+                fields[name] = int(val)
+    assert len(fields) == 2, 'Header of \'{:s}\': missing n= or N='.format(
+        in_file)
+    return(fields['n'] * fields['N'])
+
+class Trajectory(conf.Configuration):
+    """
+    Streams a sequence of configuration frames through a single
+    'Configuration' object.
+
+    Frames can be provided as a list of configuration files, as a single file
+    with several concatenated frames, or as any combination of both. Each
+    frame must follow the format described in 'Configuration', and
+    consecutive frames may be separated by blank lines.
+
+    Iterating over the trajectory refills the same object frame after frame::
+
+        traj = Trajectory(['conf_0.cfg', 'conf_1.cfg', 'conf_2.cfg'])
+        for cfg in traj:
+            cfg.Backfold()
+            sub = cfg.GetSubset(leaflet='upper', block='head')
+
+    The body of every frame is read in place into a buffer allocated for the
+    1st frame, in blocks of at most 'chunk' beads, so memory usage does not
+    grow with the number of frames. Headers are parsed for every frame, since
+    the simulation time and box may change, but the number of chains and the
+    chain length must match those of the 1st frame. Chain architectures are
+    identified once, from the 1st frame.
+
+    .. Attributes:
+
+    :param in_files: Input configuration files
+    :param chunk: Maximum number of beads parsed at once
+    :param frame: Index of the current frame (-1 before the 1st frame)
+
+    :type in_files: [str]
+    :type chunk: int
+    :type frame: int
+
+    """
+    def __init__(self, in_files, chunk=65536):
+        """
+        :param in_files: Input configuration file(s)
+        :param chunk: Maximum number of beads parsed at once
+
+        :type in_files: str or [str]
+        :type chunk: int
+
+        """
+        if(isinstance(in_files, str)):
+            in_files = [in_files]
+        for in_file in in_files:
+            assert os.path.isfile(in_file), 'Can\'t open ' + in_file
+        assert chunk > 0, 'Invalid chunk'
+        self.in_files = list(in_files)
+        self.in_file = None
+        self.chunk = chunk
+        self.frame = -1
+        self._file_frame = -1
+        self.bulk = True
+        self._InitAttributes()
+
+    def __iter__(self):
+        """
+        Reads the input frames one after another, and yields the trajectory
+        itself, holding the current frame.
+
+        """
+        self.frame = -1
+        for in_file in self.in_files:
+            self.in_file = in_file
+            self._file_frame = -1
+            with open(in_file, "r") as stream:
+                while(self._ReadFrame(stream)):
+                    self.frame += 1
+                    self._file_frame += 1
+                    yield self
+
+    def ReadFrameAt(self, in_file, offset, file_frame=0):
+        """
+        Reads a single frame, starting at the byte 'offset' of the input file
+        (see 'ScanFrames'), and returns the trajectory holding it.
+
+        :param in_file: Input configuration file
+        :param offset: Byte offset of the frame
+        :param file_frame: Index of the frame within the input file
+
+        :type in_file: str
+        :type offset: int
+        :type file_frame: int
+        :rtype: Trajectory
+
+        """
+        self.in_file = in_file
+        raw = open(in_file, 'rb')
+        raw.seek(offset)
+        with io.TextIOWrapper(raw) as stream:
+            assert self._ReadFrame(stream), \
+                'No frame at byte {:d} of {:s}'.format(offset, in_file)
+        self.frame = file_frame
+        self._file_frame = file_frame
+        return(self)
+
+    def _ReadFrame(self, stream):
+        """
+        Reads the next frame from the input stream.
+
+        :param stream: Data stream to the input configuration file
+
+        :type stream: File object
+        :returns: False if the end of the stream has been reached
+        :rtype: bool
+
+        """
+        # Header: all commented lines before the 1st bead.
+        header = []
+        line = stream.readline()
+        while(line.startswith('#') or (line.strip() == '' and line != '')):
+            if(line.startswith('#')): header.append(line)
+            line = stream.readline()
+        if(line == ''):
+            assert len(header) == 0, 'Truncated frame in ' + self.in_file
+            return(False)
+        assert len(header) > 0, 'Missing header in ' + self.in_file
+        self._ParseFrameHeader(header)
+        # Body.
+        row = 0
+        lines = [line]
+        while(True):
+            lines.extend(islice(stream, min(self.chunk, self.n_beads - row)
+                - len(lines)))
+            assert len(lines) > 0, 'Truncated frame in ' + self.in_file
+            block = np.loadtxt(lines, dtype=float, comments='#', ndmin=2)
+            self.cfg[row:row + len(block)] = block
+            row += len(block)
+            if(row == self.n_beads):
+                break
+            lines = []
+        # Derived quantities.
+        self._cm = np.mean(self.cfg[:, 0:3], axis=0)
+        if(self.ch_arch is None):
+            self._IdentifyChainArchs()
+        self._leaf = None
+        self._history = []
+        self._Invalidate()
+        return(True)
+
+    def _MemoFile(self):
+        """
+        Name of the file storing the memoized quantities of the current
+        frame, tagged with the index of the frame within its input file.
+
+        """
+        return('{:s}.{:d}{:s}'.format(self.in_file, self._file_frame,
+            self.MEMO_EXT))
+
+    def _ParseFrameHeader(self, header):
+        """
+        Parses the header of a frame and checks it is compatible with the 1st
+        frame. Allocates the configuration buffer for the 1st frame.
+
+        :param header: Header lines of the frame
+
+        :type header: [str]
+
+        """
+        base_msn = 'Header of \'{:s}\': '.format(self.in_file)
+        n_chains = self.n_chains
+        ch_len = self.ch_len
+        self._ParseHeader(iter(header))
+        if(self.cfg is None):
+            self.cfg = np.empty([self.n_beads, 7], dtype=float)
+        else:
+            assert self.n_chains == n_chains, base_msn + 'n changed'
+            assert self.ch_len == ch_len, base_msn + 'N changed'
@@ -1,5 +1,159 @@
 #!/usr/bin/python
 #encoding-utf8
+import numpy as np
+import py3_lat_press_prof as lpp
+import py3_press_ensemble as pe
+import py3_press_tens as pt
+import py3_tens_stats as ts
+"""
+.. include:: reST_press_tens_defs.rst
+
+"""
+
+# Curvature estimates of each run: surface tension, product of the bending
+# modulus and the spontaneous curvature of each leaflet, and Gaussian modulus
+# of the bilayer, with their statistical errors.
+CURV_STATS = [('file', 'U256'), ('samples', int),
+    ('tension', float), ('tension_err', float),
+    ('kc0_lower', float), ('kc0_lower_err', float),
+    ('kc0_upper', float), ('kc0_upper_err', float),
+    ('kbar', float), ('kbar_err', float)]
+ESTIMATES = ['tension', 'kc0_lower', 'kc0_upper', 'kbar']
+
+
+def curvature_kernel(height, midplane=None, limits=(None, None)):
+    """
+    Kernel of the curvature estimates (see **ESTIMATES**), for one or several
+    positions of the bilayer midplane, :math:`z_{m}`.
+
+    Each estimate is a weighted sum of |Prof| over the slabs, with weights:
+
+    * tension: :math:`-\\Delta z`, over the entire simulation box.
+    * kc0_lower, kc0_upper: :math:`-\\Delta z\\,|z_{k}-z_{m}|`, over the
+      slabs of the corresponding leaflet, i.e., the 1st integral momentum of
+      the leaflet around the midplane, along its outer normal.
+    * kbar: :math:`\\Delta z\\,(z_{k}-z_{m})^{2}`, over both leaflets, i.e.,
+      the 2nd integral momentum of the bilayer around the midplane.
+
+    The leaflets extend from the midplane up to the distances in **limits**,
+    or up to the edges of the simulation box.
+
+    :param height: Discretization of the simulation box along the bilayer
+        normal.
+    :param midplane: Position of the midplane, by default
+        :math:`z_{N/2}`, for each run.
+    :param limits: Thickness of the lower and upper leaflets.
+    :type height: ndarray([slabs], dtype=float)
+    :type midplane: float or ndarray([runs], dtype=float)
+    :type limits: (float, float)
+    :rtype: ndarray([runs, len(ESTIMATES), slabs], dtype=float)
+
+    """
+    height = np.asarray(height, dtype=float)
+    width = height[1] - height[0]
+    if(midplane is None):
+        midplane = height[len(height)//2]
+    midplane = np.atleast_1d(np.asarray(midplane, dtype=float))
+    lower, upper = [np.inf if(limit is None) else limit for limit in limits]
+    assert (lower > 0.) and (upper > 0.), 'Invalid leaflet limits'
+    disp = height[np.newaxis, :] - midplane[:, np.newaxis]
+    in_lower = (disp < 0.) & (-disp <= lower)
+    in_upper = (disp >= 0.) & (disp <= upper)
+    kernel = np.empty([len(midplane), len(ESTIMATES), len(height)],
+        dtype=float)
+    kernel[:, 0] = -width
+    kernel[:, 1] = width*disp*in_lower
+    kernel[:, 2] = -width*disp*in_upper
+    kernel[:, 3] = width*disp**2*(in_lower | in_upper)
+    return(kernel)
+
+
+def _stack_runs(runs):
+    """
+    Input files, number of samples, discretization, profiles and their errors
+    of a **PressEnsemble** or a list of **LatPressProf**.
+
+    """
+    if(isinstance(runs, pe.PressEnsemble)):
+        return(runs.tens_files, runs.samples, runs.height, runs.prof,
+            runs.prof_err, runs.prof_sem)
+    assert len(runs) > 0, 'No lateral pressure profiles'
+    height = runs[0].height
+    for run in runs:
+        assert (np.shape(run.height) == np.shape(height)) and \
+            np.allclose(run.height, height), 'Discretization of '\
+            '\'{:s}\' differs from the 1st run'.format(run.tens_file)
+    return([run.tens_file for run in runs],
+        np.array([run.samples for run in runs], dtype=int), height,
+        np.array([run.prof for run in runs]),
+        np.array([run.prof_err for run in runs]),
+        np.array([run.prof_sem for run in runs]))
+
+
+def estimate_curvature(runs, midplane=None, limits=(None, None), error='sem'):
+    """
+    Curvature estimates of many runs at once, from their lateral pressure
+    profiles (see **curvature_kernel**).
+
+    The surface tension is :math:`\\gamma`, kc0_lower and kc0_upper are the
+    products :math:`\\kappa_{m}c_{0,m}` of the bending modulus and the
+    spontaneous curvature of each leaflet, and kbar is the Gaussian modulus of
+    the bilayer, :math:`\\bar{\\kappa}`. The estimates of all the runs are
+    evaluated in a single batched product of the kernel and the profiles::
+
+        table = estimate_curvature(PressEnsemble('runs/'), limits=(25., 25.))
+
+    Errors are propagated from the error of the average profile in each slab,
+    which are treated as independent: **error**\ =\ \'sem\' takes **prof_sem**,
+    which accounts for the correlations between samples, and
+    **error**\ =\ \'err\' takes :math:`\\sigma_{\\Gamma}(z)/\\sqrt{samples}`,
+    for uncorrelated samples.
+
+    :param runs: Lateral pressure profiles, with a common discretization.
+    :param midplane: Position of the midplane, for all runs or for each run.
+    :param limits: Thickness of the lower and upper leaflets.
+    :param error: Error of the profile to be propagated: \'sem\' or \'err\'.
+    :type runs: [LatPressProf] or PressEnsemble
+    :type midplane: float or ndarray([runs], dtype=float)
+    :type limits: (float, float)
+    :type error: string
+    :returns: Table with the estimates of each run (see **CURV_STATS**).
+    :rtype: ndarray([runs], dtype=CURV_STATS)
+
+    """
+    assert error in ('sem', 'err'), 'Invalid error: ' + str(error)
+    tens_files, samples, height, prof, prof_err, prof_sem = _stack_runs(runs)
+    if(error == 'sem'):
+        prof_var = prof_sem**2
+    else:
+        prof_var = prof_err**2 / samples[:, np.newaxis]
+    kernel = curvature_kernel(height, midplane, limits)
+    # Kernels are either shared by all runs or given for each of them.
+    values = np.matmul(kernel, prof[:, :, np.newaxis])[:, :, 0]
+    errors = np.sqrt(np.matmul(kernel**2, prof_var[:, :, np.newaxis])[:, :, 0])
+    table = np.zeros(len(prof), dtype=CURV_STATS)
+    table['file'] = tens_files
+    table['samples'] = samples
+    for idx, name in enumerate(ESTIMATES):
+        table[name] = values[:, idx]
+        table[name + '_err'] = errors[:, idx]
+    return(table)
+
+
+def print_curvature(table):
+    """
+    Prints a table of curvature estimates (see **estimate_curvature**).
+
+    :type table: ndarray([runs], dtype=CURV_STATS)
+
+    """
+    print('{:<32s} {:>9s}'.format('file', 'samples') + ''.join(
+        ' {:>24s}'.format(name) for name in ESTIMATES))
+    for row in table:
+        print('{:<32s} {:>9d}'.format(row['file'], row['samples']) + ''.join(
+            ' {:>11.4g} +- {:<9.3g}'.format(row[name], row[name + '_err'])
+            for name in ESTIMATES))
+
 
 def plot_mom1_vs_lat_press_prof(run):
     """
@@ -28,15 +182,18 @@ def main():
     run_prof = []
     #CheckPressTensFile(argv[1:])
     for x in argv[1:]:
+        # Statistics of the pressure tensor, read once for both views.
+        stats = ts.get_stats(x)
         # Lateral pressure profile.
-        prof = lpp.LatPressProf(x)
+        prof = lpp.LatPressProf(stats)
         prof.get_momentum(0)
         prof.get_momentum(1)
         run_prof.append(prof)
 
         # Pressure tensor.
-        #tens = pt.PressTens(x)
-        #run_tens.append(tens)
+        tens = pt.PressTens(stats)
+        run_tens.append(tens)
+    print_curvature(estimate_curvature(run_prof))
     plot_mom1_vs_lat_press_prof(run_prof)
 
     """plt.figure(1)
@@ -50,9 +207,6 @@ def main():
 if __name__ == '__main__':
     from sys import argv
     import matplotlib.pyplot as plt
-    import py3_lat_press_prof as lpp
-    import py3_press_tens as pt
-    import numpy as np
     import math
     import os
     import io
@@ -1,7 +1,7 @@
 #!/usr/bin/python
 #encoding-utf8
-import os
-import math
+import numpy as np
+import py3_tens_stats as ts
 """
 .. include:: reST_press_tens_defs.rst
 
@@ -61,6 +61,11 @@ class LatPressProf():
 
         press_prof_object = PressProf(\'pressure_tensor_file.ext\')
 
+    The profile is a view over the statistics of the pressure tensor (see
+    **py3_tens_stats.TensStats**), which are accumulated once per file and
+    session and shared with **PressTens**. A **TensStats** object can also be
+    passed in instead of **tens_file**.
+
     This returns an object containing the average pressure profile and its
     local standard deviations, |Prof_err|, stored in **prof** and **prof_err**,
     respectively.
@@ -78,22 +83,43 @@ class LatPressProf():
     :param prof: Lateral pressure profile across the bilayer: |Prof_def|.
     :param prof_err: Standard deviation of of the lateral pressure profile:
         |Prof_err|.
+    :param prof_tau: Integrated autocorrelation time of the lateral pressure
+        profile, in samples (see **TensStats.get_autocorr_time**).
+    :param prof_sem: Statistical error of the average lateral pressure
+        profile, accounting for the correlations between samples:
+        :math:`\sigma_{\Gamma}(z)\sqrt{2\tau(z)/samples}`.
     :param samples: Number of instantaneous realization of the pressure-tensor
         in the input file.
     :param slabs: Number of slabs across the bilayer normal: |slabs|.
     :param slab_width: Width of the discretization slabs: |slab_width|.
-    :type height: [float]
-    :type prof: [float]
-    :type prof_err: [float]
+    :param stats: Statistics of the pressure tensor.
+    :type height: ndarray([slabs], dtype=float)
+    :type prof: ndarray([slabs], dtype=float)
+    :type prof_err: ndarray([slabs], dtype=float)
+    :type prof_tau: ndarray([slabs], dtype=float)
+    :type prof_sem: ndarray([slabs], dtype=float)
     :type samples: int
     :type slabs: int
     :type slab_width: float
+    :type stats: TensStats
 
     """
-    def __init__(self, tens_file):
+    def __init__(self, tens_file, chunk=1024, grades=None, stride=0):
         """
         Initialization is only possible for a properly formated input file.
 
+        :param tens_file: Input file with the instantaneous realizations of the
+            pressure tensor, or their statistics.
+        :param chunk: Maximum number of samples parsed at once.
+        :param grades: Grades of the integral momenta followed sample by
+            sample (see **get_momenta_err**).
+        :param stride: Sampling interval of the time series of integral
+            momenta (see **TensStats.get_momenta_series**).
+        :type tens_file: string or TensStats
+        :type chunk: int
+        :type grades: [int]
+        :type stride: int
+
         :param _momenta: Accumulator of integral momenta arrays: the 1st call
             to **get_momentum()** with the integer argument *n* will be
             appended to the *i-th* entry of this accumulator. Subsequent calls
@@ -102,53 +128,27 @@ class LatPressProf():
             this accumulator.
         :param _momenta_index: Link to the array of integral momenta of degree
             *n* in the **_momenta** accumulator.
-        :type _momenta: [[float]]
+        :type _momenta: [ndarray([slabs], dtype=float)]
         :type _momenta_index: {int: int}
 
         """
-        self.tens_file = self._check_tens_file(tens_file)
+        if(isinstance(tens_file, ts.TensStats)):
+            self.stats = tens_file
+        else:
+            self.stats = ts.get_stats(tens_file, chunk, grades, stride)
+        self.tens_file = self.stats.tens_file
         self._momenta = []
         self._momenta_index = {}
-        self.height = []
-        self.prof = []
-        self.prof_err = []
-        self.samples = int(0)
-        self.slabs = int(0)
-        self.slab_width = float(0.)
+        self.height = self.stats.height
+        self.samples = self.stats.samples
+        self.slabs = self.stats.slabs
+        self.slab_width = self.stats.slab_width
+        self.prof = None
+        self.prof_err = None
+        self.prof_tau = None
+        self.prof_sem = None
         self._get_profile()
 
-    def _check_tens_file(self, tens_file):
-        """
-        Verifies the existence and proper format of the input file.
-
-        Returns the validated name of the input file in case it exist and has
-        the expected format. On the contrary, the program is terminated with an
-        error message.
-
-        :param tens_file: Input file with the instantaneous realizations of the
-            pressure tensor.
-        :type tens_file: string
-        :returns: tens_file
-        :rtype: string
-
-        """
-        if(not os.path.isfile(tens_file)):
-            print('Couldn\'t find the file \'{:s}\n'.format(tens_file))
-            exit()
-        else:
-            tens_stream = open(tens_file, "r", buffering=1)
-            for line in tens_stream:
-                if(not line.startswith('#')):
-                    line = line.split()
-                    break
-            tens_stream.close()
-            # Verify there are 7 columns.
-            if(len(line) != 7):
-                print('File \'{:s}\' does not have the required format (check '\
-                    'source documentation)'.format(tens_file))
-                exit()
-        return(tens_file)
-
     def get_momentum(self, grade):
         """
         Retrieves the requested integral momenta from **_momenta**.
@@ -167,42 +167,100 @@ class LatPressProf():
         :type _index: int
         :type _FLAG: boolean
         :returns: Integral momenta of degree **grade** from the **_momenta**.
-        :rtype: [float]
+        :rtype: ndarray([slabs], dtype=float)
 
         """
         _index, _FLAG = self._get_momenta_index(grade)
-        if(not _FLAG): self._evaluate_momentum(grade)
+        if(not _FLAG): self._evaluate_momenta([grade])
         return(self._momenta[_index])
 
-    def _evaluate_momentum(self, grade):
+    def get_momenta(self, grades):
         """
-        Evaluates the integral momentum of degree **grade**.
+        Retrieves the integral momenta of several degrees at once.
 
-        The *i-th* entry of the auxiliary array, **momenta**, stores the
-        integral momenta of degree **grade**, centered at
-        :math:`z_{i}\\in[z_{0}, z_{N-1}]` and evaluated over the entire
-        simulation box. When all the centered momenta have been computed, they
-        are appended to the instance accumulator **_momenta** and the
-        corresponding tuple :math:`\\{index, grade\\}` is updated to
-        **_momenta_index**.
+        All the grades missing from **_momenta** are evaluated together (see
+        **_evaluate_momenta**).
 
-        :param grade: Grade of the requested integral momentum.
-        :param momenta: Array storing the integral momenta of degree *grade*,
-            centered at :math:`z_{i}\\in\\{z_{N/2}, ..., z_{N-1}\\}`.
-        :type grade: int
-        :type momenta: [float]
+        :param grades: Grades of the requested integral momenta.
+        :type grades: [int]
+        :returns: Integral momenta of each degree in **grades**.
+        :rtype: ndarray([len(grades), slabs], dtype=float)
+
+        """
+        missing = []
+        for grade in grades:
+            _index, _FLAG = self._get_momenta_index(grade)
+            if((not _FLAG) and (grade not in missing)): missing.append(grade)
+        if(len(missing) > 0): self._evaluate_momenta(missing)
+        return(np.array([self._momenta[self._momenta_index[grade]]
+            for grade in grades]))
+
+    def get_momenta_err(self, grades):
+        """
+        Standard deviation of the integral momenta of the samples, and
+        statistical error of the average integral momenta, accounting for the
+        correlations between samples (see **prof_sem**).
+
+        These follow from the integral momenta of each sample, so **grades**
+        must have been followed sample by sample by the statistics of the
+        pressure tensor (see **TensStats**).
+
+        :param grades: Grades of the integral momenta.
+        :type grades: [int]
+        :returns: momenta_err, momenta_sem
+        :rtype: ndarray([len(grades), slabs], dtype=float),
+            ndarray([len(grades), slabs], dtype=float)
+
+        """
+        momenta, momenta_err = self.stats.get_momenta(grades)
+        momenta_tau = self.stats.get_autocorr_time(grades=grades)
+        return(momenta_err,
+            momenta_err*np.sqrt(2.*momenta_tau/self.samples))
+
+    def _momentum_kernel(self, grades):
+        """
+        Kernel of the integral momenta of degree **grades**.
+
+        The *(n, i, k)* entry of the kernel is
+        :math:`\Delta z\,(z_{k}-z_{i})^{grade_{n}}`, so that the integral
+        momenta of a profile are the product of the kernel and the profile
+        (see |mom_n_def|). Powers of the displacement matrix are built by
+        successive multiplications, up to the largest grade.
+
+        :param grades: Grades of the integral momenta.
+        :type grades: [int]
+        :rtype: ndarray([len(grades), slabs, slabs], dtype=float)
+
+        """
+        disp = self.height[np.newaxis, :] - self.height[:, np.newaxis]
+        kernel = np.empty([len(grades), self.slabs, self.slabs], dtype=float)
+        power = np.full([self.slabs, self.slabs], self.slab_width)
+        for grade in range(max(grades) + 1):
+            for idx in np.flatnonzero(np.asarray(grades) == grade):
+                kernel[idx] = power
+            power = power*disp
+        return(kernel)
+
+    def _evaluate_momenta(self, grades):
+        """
+        Evaluates the integral momenta of degree **grades**.
+
+        The *i-th* entry of the momenta of each degree stores the integral
+        momentum centered at :math:`z_{i}\in[z_{0}, z_{N-1}]` and evaluated
+        over the entire simulation box, as the product of the momentum kernel
+        (see **_momentum_kernel**) and the profile. The momenta are appended to
+        the instance accumulator **_momenta** and the corresponding tuples
+        :math:`\{index, grade\}` are updated to **_momenta_index**.
+
+        :param grades: Grades of the requested integral momenta.
+        :type grades: [int]
 
         """
-        momenta = []
-        for i in range(self.slabs):
-            suma = float(0.)
-            for k in range(self.slabs):
-                val = self.prof[k]*((self.height[k] - self.height[i])**grade)
-                suma += val
-            momenta.append(self.slab_width*suma)
+        momenta = np.matmul(self._momentum_kernel(grades), self.prof)
         # Update momentum array and index dictionary.
-        self._momenta_index[grade] = int(len(self._momenta))
-        self._momenta.append(momenta)
+        for grade, momentum in zip(grades, momenta):
+            self._momenta_index[grade] = int(len(self._momenta))
+            self._momenta.append(momentum)
 
     def _get_momenta_index(self, grade):
         """
@@ -224,7 +282,7 @@ class LatPressProf():
 
         """
         index = -1
-        if(isinstance(grade, (int))):
+        if(isinstance(grade, (int, np.integer)) and (grade >= 0)):
             if(grade in self._momenta_index):
                 index = self._momenta_index[grade]
                 FLAG = True
@@ -232,145 +290,18 @@ class LatPressProf():
                 index = len(self._momenta)
                 FLAG = False
         else:
-            print('The argument of \'get_momentum()\' should be int')
-            print('Aborting...\n')
-            exit()
+            raise ValueError('The argument of \'get_momentum()\' should be a '\
+                'non-negative int')
         return(index, FLAG)
 
     def _get_profile(self):
         """
-        Evaluates the lateral density profile and its statistical error.
-
-        Having the sum of linear and square lateral pressure profiles
-        (**sum_lin** and **sum_sqr**, respectively) as well an estimation of its
-        local mean values (**mean**), the average density profile (**prof**) and
-        its unbiased standard deviation (**prof_err**) are computed.
-
-        .. Attributes:
-
-        :param mean: Guess of the local pressure profile mean.
-        :param sum_lin: Sum of linear deviations from the guessed mean.
-        :param sum_sqr: Sum of squared deviations from the guessed mean.
-        :type mean: [float]
-        :type sum_lin: [float]
-        :type sum_sqr: [float]
-
-
-        """
-        mean, sum_lin, sum_sqr = self._get_samples()
-        # Read realizations of the pressure profile from input file.
-
-        for slab in range(self.slabs):
-            # Normalize pressure profile and statistical error.
-            self.prof[slab] = mean[slab] + sum_lin[slab]/float(self.samples)
-            self.prof_err[slab] = sum_sqr[slab]
-            self.prof_err[slab] -= (sum_lin[slab]**2)/float(self.samples)
-            self.prof_err[slab] /= float(self.samples - 1.)
-            self.prof_err[slab] = math.sqrt(self.prof_err[slab])
-
-    def _get_samples(self):
-        """
-        Read instantaneous realizations of the pressure profile from input file.
-
-        Set the number of **samples** to be analyzed. Also sets the local sums
-        linear and squared deviations from a tentative mean (obtained from the
-        1st profile sample), which are needed for the evaluation of the local
-        averages and standard deviations.
-
-        .. Attributes:
-
-        :param mean: Guess of the local mean values.
-        :param sum_lin: Sum of linear deviations from the guessed mean.
-        :param sum_sqr: Sum of squared deviations from the guessed mean.
-        :param tens_stream: Stream to the input data file.
-        :param blanks: Consecutive blank lines in the input stream. Two blanks
-            separate individual profile realizations.
-        :param slab: Location index across the bilayer discretization.
-        :type mean: [float]
-        :type sum_lin: [float]
-        :type sum_sqr: [float]
-        :type tens_stream: text_stream
-        :type blanks: int
-        :type slab: int
-        :returns: mean, sum_lin, sum_sqr
-        :rtype: [float], [float], [float]
-
-        """
-        tens_stream = open(self.tens_file, "r", buffering=1)
-        blanks = 0
-        slab = 0
-
-        mean, sum_lin, sum_sqr = self._get_1st_sample(tens_stream)
-        # Approximation of the local mean from the 1st sample.
-        for line in tens_stream:
-            if(line == '\n'):
-                # Check for new instantaneous profile realization.
-                blanks += 1
-                if(blanks == 2):
-                    blanks = 0
-                    self.samples += 1
-                    print('Reading the lateral pressure profile from \'{:s}\''\
-                        ': Sample {:d}\r'.format(self.tens_file, self.samples)),
-            elif(not line.startswith('#')):
-                line = line.split()
-                prof = 0.5*(float(line[1]) + float(line[2])) - float(line[3])
-                sum_lin[slab] += (prof - mean[slab])
-                sum_sqr[slab] += (prof - mean[slab])**2
-                slab += 1
-                if(slab == self.slabs): slab = 0
-        print('')
-        tens_stream.close()
-        return(mean, sum_lin, sum_sqr)
-
-    def _get_1st_sample(self, tens_stream):
-        """
-        Get the 1st instantaneous realization of the pressure profile.
-
-        Sets the number of **slabs** in the pressure profile and the
-        discretization along the bilayer normal (**slab_width**). Also provides
-        a 1st approximation of the local mean, which allows the evaluation of
-        local variances in a single file-read, without round-off errors due to
-        the floating-point arithmetic of large numbers. The local sum of linear
-        and squared deviations from the approximated mean are also initialized.
-
-        Finally, the input stream to the input data file is re-winded before
-        termination.
-
-        .. Attributes:
-
-        :param tens_stream: Stream to the input data file.
-        :param mean: Guess of the local mean values.
-        :param sum_lin: Zeroed sum of linear deviations from the guessed mean.
-        :param sum_sqr: Zeroed sum of squared deviations from the guessed mean.
-        :param blanks: Consecutive blank lines in the input stream. Two blanks
-            separate individual profile realizations.
-        :type tens_stream: text_stream
-        :type mean: [float]
-        :type sum_lin: [float]
-        :type sum_sqr: [float]
-        :type blanks: int
-        :returns: mean, sum_lin, sum_sqr
-        :rtype: [float], [float], [float]
+        Evaluates the lateral density profile and its statistical error, from
+        the statistics of the diagonal components of the pressure tensor (see
+        **TensStats.get_lat_prof**).
 
         """
-        mean = []
-        sum_lin = []
-        sum_sqr = []
-        blanks = 0
-        for line in tens_stream:
-            if(line == '\n'):
-                blanks += 1
-                if(blanks == 2): break
-            elif(not line.startswith('#')):
-                line = line.split()
-                self.height.append(float(line[0]))
-                self.prof.append(float(0.))
-                self.prof_err.append(float(0.))
-                self.slabs += 1
-                prof = float(line[3]) - 0.5*(float(line[1]) + float(line[2]))
-                mean.append(prof)
-                sum_lin.append(float(0.))
-                sum_sqr.append(float(0.))
-        tens_stream.seek(0)
-        self.slab_width = self.height[1] - self.height[0]
-        return(mean, sum_lin, sum_sqr)
\ No newline at end of file
+        coef = (0.5, 0.5, -1.)
+        self.prof, self.prof_err = self.stats.get_lat_prof(coef)
+        self.prof_tau = self.stats.get_autocorr_time(coef)
+        self.prof_sem = self.prof_err*np.sqrt(2.*self.prof_tau/self.samples)
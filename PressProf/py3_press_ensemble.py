@@ -0,0 +1,224 @@
+#!/usr/bin/python
+#encoding-utf8
+import fnmatch
+import functools
+import multiprocessing
+import os
+import numpy as np
+import py3_lat_press_prof as lpp
+import py3_tens_file as tf
+import py3_tens_stats as ts
+"""
+.. include:: reST_press_tens_defs.rst
+
+"""
+
+
+def find_tens_files(directory, pattern='*'):
+    """
+    Pressure-tensor files in **directory** whose name matches **pattern**,
+    sorted by name.
+
+    Checkpoints (see **TensStats.CKPT_EXT**) and files which are not
+    pressure-tensor files (see **py3_tens_file.is_tens_file**) are skipped,
+    and text files which have been converted to the binary format are
+    replaced by their binary counterpart.
+
+    :type directory: string
+    :type pattern: string
+    :rtype: [string]
+
+    """
+    names = sorted(fnmatch.filter(os.listdir(directory), pattern))
+    tens_files = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if((not os.path.isfile(path)) or
+            name.endswith(ts.TensStats.CKPT_EXT) or
+            (name + tf.BIN_EXT in names) or (not tf.is_tens_file(path))):
+            continue
+        tens_files.append(path)
+    return(tens_files)
+
+
+def analyze_file(tens_file, grades=(0, 1), chunk=1024, checkpoint=False):
+    """
+    Lateral pressure profile of a single run, and its integral momenta.
+
+    :param tens_file: Text or binary pressure-tensor file.
+    :param grades: Grades of the integral momenta.
+    :param chunk: Maximum number of samples parsed at once.
+    :param checkpoint: Resume from the checkpoint of **tens_file** (see
+        **TensStats**).
+    :type tens_file: string
+    :type grades: [int]
+    :type chunk: int
+    :type checkpoint: boolean
+    :returns: samples, height, prof, prof_err, prof_sem, momenta
+    :rtype: int, ndarray([slabs], dtype=float), ndarray([slabs], dtype=float),
+        ndarray([slabs], dtype=float), ndarray([slabs], dtype=float),
+        ndarray([len(grades), slabs], dtype=float)
+
+    """
+    stats = ts.TensStats(tens_file, chunk, checkpoint, verbose=False)
+    prof = lpp.LatPressProf(stats)
+    return(prof.samples, prof.height, prof.prof, prof.prof_err, prof.prof_sem,
+        prof.get_momenta(grades))
+
+
+class PressEnsemble():
+    """
+    **Ensemble of lateral pressure profiles**, |Prof|, from a set of
+    independent runs, analyzed over a pool of processes.
+
+    The profile of each run, its standard deviation and statistical error,
+    and the requested integral momenta are stacked into arrays indexed by
+    run, in the order of **tens_files**. All the runs must share the same
+    discretization along the bilayer normal::
+
+        runs = PressEnsemble('runs/', grades=[0, 1, 2])
+        prof, prof_err, prof_sem, momenta = runs.average()
+
+    .. Attributes:
+
+    :param tens_files: Input pressure-tensor files, one per run.
+    :param grades: Grades of the integral momenta.
+    :param height: Discretization of the simulation box along the bilayer
+        normal.
+    :param samples: Number of samples of each run.
+    :param prof: Lateral pressure profile of each run.
+    :param prof_err: Standard deviation of the lateral pressure profile of
+        each run.
+    :param prof_sem: Statistical error of the lateral pressure profile of each
+        run (see **LatPressProf**).
+    :param momenta: Integral momenta of each run and grade.
+    :type tens_files: [string]
+    :type grades: [int]
+    :type height: ndarray([slabs], dtype=float)
+    :type samples: ndarray([runs], dtype=int)
+    :type prof: ndarray([runs, slabs], dtype=float)
+    :type prof_err: ndarray([runs, slabs], dtype=float)
+    :type prof_sem: ndarray([runs, slabs], dtype=float)
+    :type momenta: ndarray([runs, len(grades), slabs], dtype=float)
+
+    """
+    def __init__(self, tens_files, grades=(0, 1), pattern='*', workers=None,
+        chunksize=1, chunk=1024, checkpoint=False):
+        """
+        :param tens_files: Input pressure-tensor files, or a directory with
+            them (see **find_tens_files**).
+        :param grades: Grades of the integral momenta.
+        :param pattern: Pattern of the file names, if **tens_files** is a
+            directory.
+        :param workers: Number of processes (all cores if None). Runs are
+            analyzed serially if *1*.
+        :param chunksize: Number of files sent at once to each process.
+        :param chunk: Maximum number of samples parsed at once.
+        :param checkpoint: Resume from the checkpoint of each file (see
+            **TensStats**).
+        :type tens_files: string or [string]
+        :type grades: [int]
+        :type pattern: string
+        :type workers: int
+        :type chunksize: int
+        :type chunk: int
+        :type checkpoint: boolean
+
+        """
+        if(isinstance(tens_files, str)):
+            tens_files = find_tens_files(tens_files, pattern)
+        assert len(tens_files) > 0, 'No pressure-tensor files'
+        # Invalid files are rejected before any process is started.
+        for tens_file in tens_files:
+            assert tf.is_tens_file(tens_file), 'Not a pressure-tensor file: '\
+                '\'{:s}\''.format(tens_file)
+        assert chunksize > 0, 'Invalid chunksize'
+        for grade in grades:
+            assert isinstance(grade, (int, np.integer)) and (grade >= 0), \
+                'Grades should be non-negative ints'
+        self.tens_files = list(tens_files)
+        self.grades = list(grades)
+        self.height = None
+        self.samples = None
+        self.prof = None
+        self.prof_err = None
+        self.prof_sem = None
+        self.momenta = None
+        self._get_runs(workers, chunksize, chunk, checkpoint)
+
+    def _get_runs(self, workers, chunksize, chunk, checkpoint):
+        """
+        Analyzes every run (see **analyze_file**) and stacks the results.
+
+        """
+        task = functools.partial(analyze_file, grades=self.grades, chunk=chunk,
+            checkpoint=checkpoint)
+        if(workers == 1):
+            runs = self._collect_runs(map(task, self.tens_files))
+        else:
+            # The pool is terminated on leaving the block, also on errors.
+            with multiprocessing.Pool(workers) as pool:
+                runs = self._collect_runs(pool.imap(task, self.tens_files,
+                    chunksize))
+        samples, height, prof, prof_err, prof_sem, momenta = zip(*runs)
+        self.height = height[0]
+        for idx, run_height in enumerate(height):
+            assert np.allclose(run_height, self.height), 'Discretization of '\
+                '\'{:s}\' differs from the 1st run'.format(self.tens_files[idx])
+        self.samples = np.array(samples, dtype=int)
+        self.prof = np.array(prof)
+        self.prof_err = np.array(prof_err)
+        self.prof_sem = np.array(prof_sem)
+        self.momenta = np.array(momenta)
+
+    def _collect_runs(self, results):
+        """
+        Gathers the results of every run, in order, reporting the progress.
+
+        """
+        runs = []
+        for idx, run in enumerate(results):
+            runs.append(run)
+            print('Analyzed {:d}/{:d} pressure-tensor files'.format(idx + 1,
+                len(self.tens_files)), end='\r', flush=True)
+        print('')
+        return(runs)
+
+    def average(self, runs=None):
+        """
+        Average over runs, weighted by their number of samples.
+
+        The standard deviation pools the samples of all the runs, i.e., it
+        accounts for the spread of each run around its own average and for
+        the spread of the run averages. Statistical errors of independent runs
+        are combined in quadrature, with the same weights.
+
+        :param runs: Indexes of the runs to be averaged (all if None).
+        :type runs: [int]
+        :returns: prof, prof_err, prof_sem, momenta
+        :rtype: ndarray([slabs], dtype=float), ndarray([slabs], dtype=float),
+            ndarray([slabs], dtype=float),
+            ndarray([len(grades), slabs], dtype=float)
+
+        """
+        if(runs is None):
+            runs = slice(None)
+        samples = self.samples[runs].astype(float)
+        total = samples.sum()
+        weight = samples / total
+        prof = np.dot(weight, self.prof[runs])
+        momenta = np.tensordot(weight, self.momenta[runs], axes=1)
+        # Pooled sum of squared deviations.
+        sum_sqr = np.dot(samples - 1., self.prof_err[runs]**2)
+        sum_sqr += np.dot(samples, (self.prof[runs] - prof)**2)
+        prof_err = np.sqrt(sum_sqr / (total - 1.))
+        prof_sem = np.sqrt(np.dot(weight**2, self.prof_sem[runs]**2))
+        return(prof, prof_err, prof_sem, momenta)
+
+
+if __name__ == '__main__':
+    from sys import argv
+    for x in argv[1:]:
+        runs = PressEnsemble(x)
+        for tens_file, samples in zip(runs.tens_files, runs.samples):
+            print('{:s}: {:d} samples'.format(tens_file, samples))
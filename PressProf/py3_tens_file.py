@@ -0,0 +1,335 @@
+#!/usr/bin/python
+#encoding-utf8
+import os
+import struct
+import tempfile
+import warnings
+import numpy as np
+from itertools import islice
+"""
+.. include:: reST_press_tens_defs.rst
+
+"""
+
+# Binary pressure-tensor files: magic, number of slabs and samples, heights,
+# padding up to a multiple of ALIGN bytes and the (samples, slabs, 6) array of
+# pressure-tensor components, all little-endian.
+BIN_EXT = '.ptb'
+MAGIC = b'PTENS001'
+ALIGN = 64
+
+
+def is_binary(tens_file):
+    """
+    Checks if **tens_file** is a binary pressure-tensor file.
+
+    :type tens_file: string
+    :rtype: boolean
+
+    """
+    with open(tens_file, 'rb') as stream:
+        return(stream.read(len(MAGIC)) == MAGIC)
+
+
+def is_tens_file(tens_file):
+    """
+    Checks if **tens_file** is a pressure-tensor file, either binary or text
+    with seven numeric columns in its 1st data line (see **LatPressProf**).
+
+    :type tens_file: string
+    :rtype: boolean
+
+    """
+    if(not os.path.isfile(tens_file)):
+        return(False)
+    if(is_binary(tens_file)):
+        return(True)
+    with open(tens_file, 'rb') as stream:
+        for line in stream:
+            if(line.startswith(b'#') or (line.strip() == b'')):
+                continue
+            try:
+                return(len([float(x) for x in line.split()]) == 7)
+            except ValueError:
+                return(False)
+    return(False)
+
+
+def read_header(bin_file):
+    """
+    Reads the header of a binary pressure-tensor file.
+
+    :param bin_file: Binary pressure-tensor file.
+    :type bin_file: string
+    :returns: Discretization along the bilayer normal, number of samples and
+        offset of the pressure-tensor components.
+    :rtype: ndarray([slabs], dtype=float), int, int
+
+    """
+    with open(bin_file, 'rb') as stream:
+        assert stream.read(len(MAGIC)) == MAGIC, 'Not a binary pressure-'\
+            'tensor file: ' + bin_file
+        slabs, samples = struct.unpack('<QQ', stream.read(16))
+        height = np.fromfile(stream, dtype='<f8', count=slabs)
+    return(height, samples, _offset(slabs))
+
+
+def _offset(slabs):
+    """
+    Offset of the pressure-tensor components in a binary file.
+
+    """
+    offset = len(MAGIC) + 16 + 8*slabs
+    return(offset + (-offset % ALIGN))
+
+
+def load_tens(bin_file, start=0, stop=None):
+    """
+    Maps the pressure-tensor samples of a binary file into memory.
+
+    Nothing is read until the samples are accessed, so that slicing out a
+    sub-range of samples is free.
+
+    :param bin_file: Binary pressure-tensor file.
+    :param start: 1st sample.
+    :param stop: Last sample (excluded), by default the end of the file.
+    :type bin_file: string
+    :type start: int
+    :type stop: int
+    :returns: Discretization along the bilayer normal, and components
+        |P_xx|, |P_yy|, |P_zz|, |P_xy|, |P_xz| and |P_yz| of each sample.
+    :rtype: ndarray([slabs], dtype=float),
+        memmap([samples, slabs, 6], dtype=float)
+
+    """
+    height, samples, offset = read_header(bin_file)
+    if(samples == 0):
+        return(height, np.empty([0, len(height), 6], dtype=float))
+    tens = np.memmap(bin_file, dtype='<f8', mode='r', offset=offset,
+        shape=(samples, len(height), 6))
+    return(height, tens[start:stop])
+
+
+def read_samples(tens_file, chunk=1024, start=0, stop=None):
+    """
+    Reads the instantaneous realizations of the pressure tensor from a text
+    or binary file, in blocks of at most **chunk** samples.
+
+    Binary files are mapped into memory (see **load_tens**). Text files are
+    read in a single pass (see **read_blocks**).
+
+    :param tens_file: Text or binary pressure-tensor file.
+    :param chunk: Maximum number of samples in a block.
+    :param start: 1st sample.
+    :param stop: Last sample (excluded), by default the end of the file.
+    :type tens_file: string
+    :type chunk: int
+    :type start: int
+    :type stop: int
+    :returns: Discretization along the bilayer normal and the components
+        |P_xx|, |P_yy|, |P_zz|, |P_xy|, |P_xz| and |P_yz| of each sample in
+        the block.
+    :rtype: ndarray([slabs], dtype=float),
+        ndarray([n_samples, slabs, 6], dtype=float)
+
+    """
+    sample = 0
+    for height, block, end in read_blocks(tens_file, chunk, verbose=True):
+        first = sample
+        sample += len(block)
+        if(sample <= start):
+            continue
+        if((stop is not None) and (first >= stop)):
+            break
+        lower = max(start - first, 0)
+        upper = len(block) if(stop is None) else min(stop - first, len(block))
+        yield(height, block[lower:upper])
+
+
+def read_blocks(tens_file, chunk=1024, offset=0, height=None, verbose=False,
+    append=False):
+    """
+    Reads the instantaneous realizations of the pressure tensor from a text
+    or binary file, in blocks of at most **chunk** samples, starting at the
+    byte **offset**, and reports the byte offset after each block.
+
+    Reading from the offset after the last block of a previous read folds in
+    only the samples appended to the file in the meantime. In that case, the
+    discretization along the bilayer normal, **height**, must be provided.
+
+    Text files are read in a single pass: the 1st sample sets the
+    discretization along the bilayer normal, and later samples are read in
+    blocks of raw lines, which are tokenized in a single call to the NumPy
+    text loader. Comments and blank lines are skipped, and rows which do not
+    complete a sample are carried over to the next block: samples are told
+    apart by their number of rows. A last line without its newline is still
+    being written, so it is left out, together with the rest of its sample,
+    and read again from the reported offset.
+
+    Rows of an incomplete last sample are never yielded. In **append** mode,
+    i.e., when the file is still being written and the reported offset is
+    kept for the next read, they are deferred to that read.
+
+    :param tens_file: Text or binary pressure-tensor file.
+    :param chunk: Maximum number of samples in a block.
+    :param offset: Byte offset of the 1st sample to be read.
+    :param height: Discretization along the bilayer normal, if **offset** is
+        not the beginning of the file.
+    :param verbose: Report an incomplete last sample.
+    :param append: The file may still be appended to.
+    :type tens_file: string
+    :type chunk: int
+    :type offset: int
+    :type height: ndarray([slabs], dtype=float)
+    :type verbose: boolean
+    :type append: boolean
+    :returns: Discretization along the bilayer normal, the components of each
+        sample in the block, and the byte offset after its last sample.
+    :rtype: ndarray([slabs], dtype=float),
+        ndarray([n_samples, slabs, 6], dtype=float), int
+
+    """
+    assert (offset == 0) or (height is not None), 'Missing \'height\''
+    if(is_binary(tens_file)):
+        return(_read_binary_blocks(tens_file, chunk, offset))
+    return(_read_text_blocks(tens_file, chunk, offset, height, verbose,
+        append))
+
+
+def _read_binary_blocks(bin_file, chunk, offset):
+    """
+    Binary implementation of **read_blocks**.
+
+    """
+    height, tens = load_tens(bin_file)
+    size = 8*6*len(height)
+    data = _offset(len(height))
+    first = 0 if(offset == 0) else (offset - data) // size
+    for first in range(first, len(tens), chunk):
+        block = tens[first:first + chunk]
+        yield(height, block, data + (first + len(block))*size)
+
+
+def _read_text_blocks(tens_file, chunk, offset, height, verbose, append):
+    """
+    Text implementation of **read_blocks**.
+
+    """
+    with open(tens_file, "rb") as tens_stream:
+        tens_stream.seek(offset)
+        lines = None
+        if(height is None):
+            # 1st sample, terminated by two blank lines.
+            block = []
+            blanks = 0
+            lines = 0
+            for line in tens_stream:
+                if(not line.endswith(b'\n')):
+                    # 1st sample still being written: nothing to read yet.
+                    return
+                lines += 1
+                offset += len(line)
+                if(line.strip() == b''):
+                    blanks += 1
+                    if(blanks == 2): break
+                elif(not line.startswith(b'#')):
+                    block.append(line)
+                    end = offset
+            if(blanks < 2):
+                # 1st sample not terminated yet: it sets the discretization,
+                # so it is only read once complete.
+                return
+            first = np.loadtxt(block, dtype=float, ndmin=2)
+            height = first[:, 0].copy()
+            yield(height, first[np.newaxis, :, 1:], end)
+        slabs = len(height)
+        if(lines is None):
+            lines = slabs + 3
+        # Later samples, about **chunk** samples worth of lines at a time.
+        rows = np.empty([0, 7], dtype=float)
+        while(True):
+            block = list(islice(tens_stream, chunk*lines))
+            if((len(block) > 0) and (not block[-1].endswith(b'\n'))):
+                # Line still being written: left for the next read.
+                block.pop()
+            if(len(block) == 0):
+                break
+            offset += sum(map(len, block))
+            with warnings.catch_warnings():
+                # Blocks with only comments or blank lines are expected.
+                warnings.simplefilter('ignore', UserWarning)
+                new = np.loadtxt(block, dtype=float, comments='#', ndmin=2)
+            if(len(new) == 0):
+                continue
+            rows = np.concatenate([rows, new])
+            n_samples = len(rows) // slabs
+            if(n_samples > 0):
+                cut = n_samples*slabs
+                yield(height, rows[:cut, 1:].reshape(n_samples, slabs, 6),
+                    _sample_end(block, offset, len(rows) - cut))
+                rows = rows[cut:]
+    if(verbose and (len(rows) > 0)):
+        print('Incomplete sample at the end of \'{:s}\' ({:d} of {:d} '\
+            'slabs): {:s}'.format(tens_file, len(rows), slabs,
+            'deferred to the next read' if(append) else 'ignored'))
+
+
+def _sample_end(block, offset, carry):
+    """
+    Byte offset after the last complete sample in a block of text lines,
+    i.e., after the last data line before the **carry** data lines which do
+    not complete a sample. The block ends at the byte **offset**.
+
+    """
+    for line in reversed(block):
+        if((not line.startswith(b'#')) and (line.strip() != b'')):
+            if(carry == 0):
+                break
+            carry -= 1
+        offset -= len(line)
+    return(offset)
+
+
+def convert_tens_file(tens_file, bin_file=None, chunk=1024):
+    """
+    Converts a text pressure-tensor file into the binary format.
+
+    The binary file is written to a temporary file in the same directory and
+    then renamed, so that readers never see a partially written file.
+
+    :param tens_file: Text pressure-tensor file.
+    :param bin_file: Binary pressure-tensor file, by default **tens_file**
+        with the extension **BIN_EXT** appended.
+    :param chunk: Maximum number of samples parsed at once.
+    :type tens_file: string
+    :type bin_file: string
+    :type chunk: int
+    :returns: bin_file
+    :rtype: string
+
+    """
+    if(bin_file is None):
+        bin_file = tens_file + BIN_EXT
+    fd, tmp_file = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(bin_file)), suffix=BIN_EXT)
+    samples = 0
+    with os.fdopen(fd, 'wb') as stream:
+        for height, block in read_samples(tens_file, chunk):
+            if(samples == 0):
+                # The number of samples is set once all of them are written.
+                stream.write(MAGIC)
+                stream.write(struct.pack('<QQ', len(height), 0))
+                stream.write(height.astype('<f8').tobytes())
+                stream.write(b'\0' * (_offset(len(height)) - stream.tell()))
+            np.ascontiguousarray(block, dtype='<f8').tofile(stream)
+            samples += len(block)
+        stream.seek(len(MAGIC) + 8)
+        stream.write(struct.pack('<Q', samples))
+    os.replace(tmp_file, bin_file)
+    return(bin_file)
+
+
+if __name__ == '__main__':
+    from sys import argv
+    for x in argv[1:]:
+        print('{:s} -> {:s}'.format(x, convert_tens_file(x)))
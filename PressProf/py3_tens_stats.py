@@ -0,0 +1,826 @@
+#!/usr/bin/python
+#encoding-utf8
+import copy
+import math
+import os
+import tempfile
+import zipfile
+import zlib
+import numpy as np
+import py3_tens_file as tf
+"""
+.. include:: reST_press_tens_defs.rst
+
+"""
+
+# Statistics already accumulated in this session, keyed by file (see
+# **get_stats**).
+_STATS = {}
+
+
+def get_stats(tens_file, chunk=1024, grades=None, stride=0):
+    """
+    Statistics of the pressure tensor in **tens_file**, read only once per
+    session.
+
+    Later calls with the same file return the same **TensStats** object, so
+    that **PressTens** and **LatPressProf** objects built for the same file
+    share a single read. Samples appended to the file in the meantime are
+    folded into a copy (see **TensStats.update**), so that objects built
+    earlier keep statistics consistent with their own results. Files which
+    have been otherwise modified, or whose statistics do not follow the
+    requested integral momenta, are read again.
+
+    :param tens_file: Text or binary pressure-tensor file.
+    :param chunk: Maximum number of samples parsed at once.
+    :param grades: Grades of the integral momenta followed sample by sample
+        (see **TensStats**).
+    :param stride: Sampling interval of the time series of integral momenta.
+    :type tens_file: string
+    :type chunk: int
+    :type grades: [int]
+    :type stride: int
+    :rtype: TensStats
+
+    """
+    key = os.path.realpath(tens_file)
+    raw_grade = max(grades) if(grades) else -1
+    if((key in _STATS) and (_STATS[key].raw_grade >= raw_grade) and
+        ((stride == 0) or (_STATS[key].stride == stride)) and
+        _STATS[key]._is_prefix()):
+        stats = copy.deepcopy(_STATS[key])
+        if(stats.update() > 0):
+            _STATS[key] = stats
+    else:
+        _STATS[key] = TensStats(tens_file, chunk, grades=grades, stride=stride)
+    return(_STATS[key])
+
+
+class TensStats():
+    """
+    **Statistics of the pressure tensor**, |P_ab|, across a planar bilayer,
+    accumulated in a single read of the input file.
+
+    The six components of the pressure tensor, |P_xx|, |P_yy|, |P_zz|,
+    |P_xy|, |P_xz| and |P_yz|, are accumulated as sums of linear and squared
+    deviations from a tentative mean (the 1st sample), together with the sums
+    of cross deviations between the diagonal components. Derived profiles,
+    which are linear combinations of the diagonal components, and their
+    standard deviations are evaluated from these sums, without reading the
+    input file again:
+
+    - **get_tens()**: Average pressure tensor and its standard deviation.
+    - **get_lat_prof()**: Lateral pressure profile (see **LatPressProf**).
+    - **get_tension()**: Surface tension,
+      :math:`\\gamma = \\Delta z\\sum_{k=0}^{N-1}`
+      :math:`\\left\\{P_{zz}(z_{k})-\\left[P_{xx}(z_{k})+P_{yy}(z_{k})\\right]/2
+      \\right\\}`, whose standard deviation is accumulated sample by sample,
+      since it depends on the correlations between slabs.
+
+    Consecutive samples are correlated, so the standard deviation of the
+    samples underestimates the statistical error of the averages. The same
+    sums are thus accumulated for the averages over blocks of
+    :math:`2^l` consecutive samples, with :math:`l = 1, ..., ` **LEVELS**
+    (blocking analysis), from which the statistical error of the averages and
+    the integrated autocorrelation time of each slab are estimated:
+
+    - **get_block_errors()**: Statistical error of the averages, for each
+      block size.
+    - **get_autocorr_time()**: Integrated autocorrelation time of each slab.
+    - **get_required_samples()**: Samples needed to reach a target error.
+
+    The integral momenta of the lateral pressure profile (see
+    **LatPressProf**) can also be followed sample by sample, up to the largest
+    of the requested **grades**, without storing the samples. The raw momenta
+    around the midplane, :math:`M_{j} = \\Delta z\\sum_{k}(z_{k}-z_{N/2})^{j}
+    \\Gamma(z_{k})`, are the product of a small kernel and the profile of
+    each sample, and their sums of products are accumulated, as well as those
+    of their block averages. The momenta centered at any slab follow from the
+    raw momenta by a binomial shift, together with their standard deviations
+    and autocorrelation times. The raw momenta of every **stride**-th sample
+    are kept as a time series:
+
+    - **get_momenta()**: Average integral momenta and their standard
+      deviations.
+    - **get_momenta_series()**: Time series of the integral momenta.
+    - **get_block_errors()**, **get_autocorr_time()** and
+      **get_required_samples()**, given the **grades** of the momenta.
+
+    **PressTens** and **LatPressProf** are views over these statistics.
+
+    Input files which keep growing, as simulations append samples, need not
+    be read again from the start: **update()** folds in the samples appended
+    since the last read, and the accumulators can be saved to a checkpoint
+    next to the input file (**tens_file** + **CKPT_EXT**), from which later
+    sessions resume::
+
+        stats = TensStats('pressure_tensor_file.ext', checkpoint=True)
+
+    .. Attributes:
+
+    :param tens_file: Input file with the instantaneous realizations of the
+        pressure tensor.
+    :param height: Discretization of the simulation box along the bilayer
+        normal.
+    :param samples: Number of instantaneous realization of the pressure-tensor
+        in the input file.
+    :param slabs: Number of slabs across the bilayer normal: |slabs|.
+    :param slab_width: Width of the discretization slabs: |slab_width|.
+    :param comps: Number of independent components in the pressure tensor.
+    :param chunk: Maximum number of samples parsed at once.
+    :param mean: Guess of the local mean values (1st sample).
+    :param sum_lin: Sum of linear deviations from the guessed mean.
+    :param sum_sqr: Sum of squared deviations from the guessed mean.
+    :param sum_diag: Sum of the products of deviations between the diagonal
+        components, |P_aa|.
+    :param tension: Guess of the mean surface tension, and sums of its linear
+        and squared deviations.
+    :param blocks: Number of complete blocks at each block size.
+    :param blk_lin: Sum of the block averages of the linear deviations.
+    :param blk_sqr: Sum of the squared block averages of the deviations.
+    :param blk_diag: Sum of the products of block averages of the deviations
+        of the diagonal components.
+    :param raw_grade: Largest grade of the raw integral momenta followed
+        sample by sample (*-1* if none).
+    :param raw_prod: Sum of the products of the deviations of the raw
+        integral momenta from their guessed mean.
+    :param raw_blk_prod: Sum of the products of the block averages of the
+        deviations of the raw integral momenta.
+    :param stride: Sampling interval of the time series of raw integral
+        momenta (none if *0*).
+    :param raw_series: Raw integral momenta of every **stride**-th sample.
+    :param offset: Byte offset after the last sample read.
+    :type tens_file: string
+    :type height: ndarray([slabs], dtype=float)
+    :type samples: int
+    :type slabs: int
+    :type slab_width: float
+    :type comps: int
+    :type chunk: int
+    :type mean: ndarray([comps, slabs], dtype=float)
+    :type sum_lin: ndarray([comps, slabs], dtype=float)
+    :type sum_sqr: ndarray([comps, slabs], dtype=float)
+    :type sum_diag: ndarray([3, 3, slabs], dtype=float)
+    :type tension: ndarray([3], dtype=float)
+    :type blocks: ndarray([LEVELS], dtype=int)
+    :type blk_lin: ndarray([LEVELS, comps, slabs], dtype=float)
+    :type blk_sqr: ndarray([LEVELS, comps, slabs], dtype=float)
+    :type blk_diag: ndarray([LEVELS, 3, 3, slabs], dtype=float)
+    :type raw_grade: int
+    :type raw_prod: ndarray([raw_grade + 1, raw_grade + 1], dtype=float)
+    :type raw_blk_prod:
+        ndarray([LEVELS, raw_grade + 1, raw_grade + 1], dtype=float)
+    :type stride: int
+    :type raw_series:
+        ndarray([ceil(samples / stride), raw_grade + 1], dtype=float)
+    :type offset: int
+
+    """
+    # Number of block sizes of the blocking analysis: 2, 4, ..., 2**LEVELS.
+    LEVELS = 10
+    # Minimum number of blocks for the autocorrelation time estimate.
+    MIN_BLOCKS = 32
+    # Coefficients of the diagonal components in the lateral pressure profile
+    # (see **get_lat_prof**).
+    PROF_COEF = (0.5, 0.5, -1.)
+    # Checkpoint of the accumulators, written next to the input file.
+    CKPT_EXT = '.ckpt'
+    # Accumulators stored in checkpoints.
+    CKPT_ARRAYS = ('height', 'mean', 'sum_lin', 'sum_sqr', 'sum_diag',
+        'tension', 'blocks', 'blk_lin', 'blk_sqr', 'blk_diag', '_pending',
+        '_has_pending',
+        'raw_prod', 'raw_blk_prod', 'raw_series')
+    CKPT_SCALARS = ('samples', 'slabs', 'slab_width', 'comps', 'offset',
+        'raw_grade', 'stride')
+    # Bytes before **offset** checked to verify that the input file has only
+    # been appended to.
+    CRC_BYTES = 4096
+
+    def __init__(self, tens_file, chunk=1024, checkpoint=False, verbose=True,
+        grades=None, stride=0):
+        """
+        Initialization is only possible for a properly formated input file.
+
+        The input file is read once, in blocks of at most **chunk** samples, so
+        memory usage does not grow with the number of samples.
+
+        :param tens_file: Text or binary pressure-tensor file.
+        :param chunk: Maximum number of samples parsed at once.
+        :param checkpoint: Resume from the checkpoint of the input file, if
+            it is valid, and save the checkpoint after reading.
+        :param verbose: Print the reading progress.
+        :param grades: Grades of the integral momenta followed sample by
+            sample (none by default).
+        :param stride: Keep the integral momenta of every **stride**-th
+            sample as a time series (none if *0*).
+        :type tens_file: string
+        :type chunk: int
+        :type checkpoint: boolean
+        :type verbose: boolean
+        :type grades: [int]
+        :type stride: int
+
+        """
+        self.tens_file = self._check_tens_file(tens_file)
+        self.chunk = int(chunk)
+        self.verbose = verbose
+        self.height = None
+        self.samples = int(0)
+        self.slabs = int(0)
+        self.slab_width = float(0.)
+        self.comps = int(0)
+        self.mean = None
+        self.sum_lin = None
+        self.sum_sqr = None
+        self.sum_diag = None
+        self.tension = None
+        self.blocks = None
+        self.blk_lin = None
+        self.blk_sqr = None
+        self.blk_diag = None
+        self.raw_grade = max(grades) if(grades) else -1
+        assert self.raw_grade >= -1, 'Invalid grades'
+        assert (stride >= 0) and ((stride == 0) or (self.raw_grade >= 0)), \
+            'Invalid stride'
+        self.stride = int(stride)
+        self.raw_prod = None
+        self.raw_blk_prod = None
+        self.raw_series = None
+        self._raw_kernel = None
+        # Pending block average at each level, still waiting for its pair
+        # (the 1st level holds single samples).
+        self._pending = None
+        self._has_pending = None
+        self.offset = int(0)
+        self._crc = None
+        if(not (checkpoint and self._load_checkpoint())):
+            self._get_samples()
+        else:
+            self.update()
+        if(checkpoint):
+            self.save_checkpoint()
+
+    def _check_tens_file(self, tens_file):
+        """
+        Verifies the existence and proper format of the input file.
+
+        Returns the validated name of the input file in case it exist and has
+        the expected format, either text or binary (see **py3_tens_file**). On
+        the contrary, an exception is raised, so that the error also reaches
+        the calling process when the file is read by a pool of processes.
+
+        :param tens_file: Input file with the instantaneous realizations of the
+            pressure tensor.
+        :type tens_file: string
+        :returns: tens_file
+        :rtype: string
+
+        """
+        if(not os.path.isfile(tens_file)):
+            raise IOError('Couldn\'t find the file \'{:s}\''.format(tens_file))
+        elif(not tf.is_tens_file(tens_file)):
+            raise ValueError('File \'{:s}\' does not have the required format '\
+                '(check source documentation)'.format(tens_file))
+        return(tens_file)
+
+    def _get_samples(self):
+        """
+        Read instantaneous realizations of the pressure tensor from input file.
+
+        Samples are parsed in blocks of at most **chunk** samples (see
+        **py3_tens_file.read_blocks**), starting at **offset**, and each block
+        is folded into the sums of deviations at once.
+
+        :returns: Number of samples read.
+        :rtype: int
+
+        """
+        samples = self.samples
+        for height, block, end in tf.read_blocks(self.tens_file, self.chunk,
+            self.offset, self.height, self.verbose, append=True):
+            # Components along the 1st axis.
+            block = np.transpose(block, (0, 2, 1))
+            if(self.mean is None):
+                self._init_sums(height, block[0])
+            self._add_block(block)
+            self.offset = end
+            if(self.verbose):
+                print('Reading the pressure tensor from \'{:s}\''\
+                    ': Sample {:d}\r'.format(self.tens_file, self.samples),
+                    end='')
+        if(self.verbose):
+            print('')
+        self._crc = self._tail_crc()
+        return(self.samples - samples)
+
+    def update(self):
+        """
+        Folds in the samples appended to the input file since the last read.
+
+        Objects built on these statistics (**PressTens**, **LatPressProf**)
+        are not updated: they have to be built again.
+
+        :returns: Number of new samples.
+        :rtype: int
+
+        """
+        assert self._is_prefix(), 'File \'{:s}\' has been modified, not '\
+            'appended to'.format(self.tens_file)
+        if(os.path.getsize(self.tens_file) == self.offset):
+            return(0)
+        return(self._get_samples())
+
+    def _tail_crc(self):
+        """
+        Checksum of the **CRC_BYTES** bytes of the input file before
+        **offset**.
+
+        """
+        start = max(self.offset - self.CRC_BYTES, 0)
+        with open(self.tens_file, 'rb') as stream:
+            stream.seek(start)
+            return(zlib.crc32(stream.read(self.offset - start)))
+
+    def _is_prefix(self):
+        """
+        Checks that the samples read so far are still at the beginning of the
+        input file, i.e., that it has only been appended to.
+
+        :rtype: boolean
+
+        """
+        return((os.path.getsize(self.tens_file) >= self.offset) and
+            (self._tail_crc() == self._crc))
+
+    def _checkpoint_file(self):
+        """
+        Name of the checkpoint of the input file.
+
+        """
+        return(self.tens_file + self.CKPT_EXT)
+
+    def save_checkpoint(self):
+        """
+        Saves the accumulators, the number of samples and the byte offset
+        after the last sample read next to the input file.
+
+        The checkpoint is first written to a temporary file in the same
+        directory and then renamed, so that concurrent readers never see a
+        partially written checkpoint. Nothing is saved until the 1st sample
+        has been read.
+
+        """
+        if(self.samples == 0):
+            return
+        state = {name: getattr(self, name) for name in self.CKPT_ARRAYS}
+        for name in self.CKPT_SCALARS:
+            state[name] = getattr(self, name)
+        state['crc'] = self._crc
+        state['levels'] = self.LEVELS
+        ckpt_file = self._checkpoint_file()
+        fd, tmp_file = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(ckpt_file)),
+            suffix=self.CKPT_EXT)
+        with os.fdopen(fd, 'wb') as stream:
+            np.savez(stream, **state)
+        os.replace(tmp_file, ckpt_file)
+
+    def _load_checkpoint(self):
+        """
+        Loads the accumulators from the checkpoint of the input file.
+
+        Returns False, leaving the object untouched, if the checkpoint is
+        missing or unreadable, was written with a different number of block
+        sizes, or if the input file has been modified other than by appending
+        samples.
+
+        :returns: Whether the checkpoint has been loaded
+        :rtype: boolean
+
+        """
+        ckpt_file = self._checkpoint_file()
+        if(not os.path.isfile(ckpt_file)):
+            return(False)
+        try:
+            with np.load(ckpt_file) as state:
+                state = {name: state[name] for name in state.files}
+            if((int(state['levels']) != self.LEVELS) or
+                any(name not in state for name in
+                self.CKPT_ARRAYS + self.CKPT_SCALARS + ('crc',))):
+                return(False)
+        except(OSError, EOFError, ValueError, KeyError, TypeError,
+            zipfile.BadZipFile):
+            return(False)
+        # The checkpoint must follow at least the requested raw momenta.
+        if((int(state['raw_grade']) < self.raw_grade) or
+            ((self.stride > 0) and (int(state['stride']) != self.stride))):
+            return(False)
+        offset = self.offset
+        self.offset = int(state['offset'])
+        self._crc = int(state['crc'])
+        if(not self._is_prefix()):
+            self.offset = offset
+            self._crc = None
+            return(False)
+        for name in self.CKPT_ARRAYS:
+            setattr(self, name, state[name])
+        self.samples = int(state['samples'])
+        self.slabs = int(state['slabs'])
+        self.slab_width = float(state['slab_width'])
+        self.comps = int(state['comps'])
+        self.raw_grade = int(state['raw_grade'])
+        self.stride = int(state['stride'])
+        self._raw_kernel = self._get_raw_kernel()
+        return(True)
+
+    def _init_sums(self, height, first):
+        """
+        Sets the discretization along the bilayer normal, takes the 1st sample
+        as the tentative mean and zeroes the sums of deviations.
+
+        :param height: Discretization along the bilayer normal.
+        :param first: 1st sample.
+        :type height: ndarray([slabs], dtype=float)
+        :type first: ndarray([comps, slabs], dtype=float)
+
+        """
+        self.height = height
+        self.slabs = len(height)
+        self.slab_width = height[1] - height[0]
+        self.comps = len(first)
+        self.mean = np.array(first, dtype=float)
+        self.sum_lin = np.zeros([self.comps, self.slabs], dtype=float)
+        self.sum_sqr = np.zeros([self.comps, self.slabs], dtype=float)
+        self.sum_diag = np.zeros([3, 3, self.slabs], dtype=float)
+        self.tension = np.zeros(3, dtype=float)
+        self.tension[0] = self._sample_tension(self.mean[np.newaxis])[0]
+        self.blocks = np.zeros(self.LEVELS, dtype=int)
+        self.blk_lin = np.zeros([self.LEVELS, self.comps, self.slabs])
+        self.blk_sqr = np.zeros([self.LEVELS, self.comps, self.slabs])
+        self.blk_diag = np.zeros([self.LEVELS, 3, 3, self.slabs])
+        self._pending = np.zeros([self.LEVELS, self.comps, self.slabs])
+        self._has_pending = np.zeros(self.LEVELS, dtype=bool)
+        raws = self.raw_grade + 1
+        self._raw_kernel = self._get_raw_kernel()
+        self.raw_prod = np.zeros([raws, raws], dtype=float)
+        self.raw_blk_prod = np.zeros([self.LEVELS, raws, raws], dtype=float)
+        self.raw_series = np.empty([0, raws], dtype=float)
+
+    def _get_raw_kernel(self):
+        """
+        Kernel of the raw integral momenta around the midplane, whose *(j, k)*
+        entry is :math:`\\Delta z\\,(z_{k}-z_{N/2})^{j}`.
+
+        :rtype: ndarray([raw_grade + 1, slabs], dtype=float)
+
+        """
+        disp = self.height - self.height[self.slabs//2]
+        return(self.slab_width*disp[np.newaxis, :]**
+            np.arange(self.raw_grade + 1)[:, np.newaxis])
+
+    def _raw_momenta(self, dev):
+        """
+        Raw integral momenta of the lateral pressure profile of each sample,
+        as the product of the kernel and the profile.
+
+        :type dev: ndarray([n_samples, comps, slabs], dtype=float)
+        :rtype: ndarray([n_samples, raw_grade + 1], dtype=float)
+
+        """
+        prof = np.tensordot(self.PROF_COEF, dev[:, 0:3], axes=([0], [1]))
+        return(np.matmul(prof, self._raw_kernel.T))
+
+    def _add_block(self, block):
+        """
+        Folds a block of samples into the sums of deviations.
+
+        :param block: Pressure-tensor components of each sample.
+        :type block: ndarray([n_samples, comps, slabs], dtype=float)
+
+        """
+        dev = block - self.mean
+        self.sum_lin += dev.sum(axis=0)
+        self.sum_sqr += (dev*dev).sum(axis=0)
+        self.sum_diag += self._diag_products(dev)
+        tension = self._sample_tension(block) - self.tension[0]
+        self.tension[1] += tension.sum()
+        self.tension[2] += (tension*tension).sum()
+        if(self.raw_grade >= 0):
+            raw = self._raw_momenta(dev)
+            self.raw_prod += np.matmul(raw.T, raw)
+            if(self.stride > 0):
+                keep = (self.samples + np.arange(len(raw))) % self.stride == 0
+                raw = self._raw_momenta(block[keep])
+                self.raw_series = np.concatenate([self.raw_series, raw])
+        self.samples += len(block)
+        self._fold_blocks(dev)
+
+    def _fold_blocks(self, dev):
+        """
+        Folds the averages of the blocks of each size completed by a sequence
+        of deviations into the block sums.
+
+        Blocks are built by the streaming recursion of the blocking analysis:
+        at each level, pairs of consecutive averages are averaged into the
+        next level, and an unpaired average is kept pending until the next
+        call, so that at most one partial block per level is stored.
+
+        :param dev: Deviations of consecutive samples from the guessed mean.
+        :type dev: ndarray([n_samples, comps, slabs], dtype=float)
+
+        """
+        avg = dev
+        for level in range(self.LEVELS):
+            if(self._has_pending[level]):
+                avg = np.concatenate([self._pending[level][np.newaxis], avg])
+            # Averages over blocks twice as long as in the previous level.
+            n_blocks = len(avg) // 2
+            self._has_pending[level] = (len(avg) % 2 == 1)
+            self._pending[level] = avg[-1] if(self._has_pending[level]) else 0.
+            if(n_blocks == 0):
+                break
+            avg = 0.5*(avg[0:2*n_blocks:2] + avg[1:2*n_blocks:2])
+            self.blocks[level] += n_blocks
+            self.blk_lin[level] += avg.sum(axis=0)
+            self.blk_sqr[level] += (avg*avg).sum(axis=0)
+            self.blk_diag[level] += self._diag_products(avg)
+            if(self.raw_grade >= 0):
+                raw = self._raw_momenta(avg)
+                self.raw_blk_prod[level] += np.matmul(raw.T, raw)
+
+    def _diag_products(self, dev):
+        """
+        Sums over samples of the products of deviations between the diagonal
+        components, as a batched matrix product over slabs.
+
+        :type dev: ndarray([n_samples, comps, slabs], dtype=float)
+        :rtype: ndarray([3, 3, slabs], dtype=float)
+
+        """
+        diag = np.ascontiguousarray(np.transpose(dev[:, 0:3], (2, 1, 0)))
+        prod = np.matmul(diag, np.transpose(diag, (0, 2, 1)))
+        return(np.transpose(prod, (1, 2, 0)))
+
+    def _sample_tension(self, block):
+        """
+        Surface tension of each sample.
+
+        :type block: ndarray([n_samples, comps, slabs], dtype=float)
+        :rtype: ndarray([n_samples], dtype=float)
+
+        """
+        prof = block[:, 2] - 0.5*(block[:, 0] + block[:, 1])
+        return(self.slab_width*prof.sum(axis=1))
+
+    def _check_samples(self):
+        """
+        Verifies that at least one sample has been read. The statistics are
+        empty while the 1st sample of a live input file is still being
+        written: **update** has to be called again later.
+
+        """
+        if(self.samples == 0):
+            raise ValueError('No complete sample in \'{:s}\' yet'.format(
+                self.tens_file))
+
+    def _average(self, mean, sum_lin, sum_sqr):
+        """
+        Average and unbiased standard deviation from the sums of deviations
+        from a tentative mean.
+
+        """
+        avg = mean + sum_lin/float(self.samples)
+        err = sum_sqr - (sum_lin**2)/float(self.samples)
+        err /= float(self.samples - 1.)
+        return(avg, np.sqrt(err))
+
+    def get_tens(self):
+        """
+        Average pressure tensor and its standard deviation, |P_ab_err|.
+
+        :returns: tens, tens_err
+        :rtype: ndarray([comps, slabs], dtype=float),
+            ndarray([comps, slabs], dtype=float)
+
+        """
+        self._check_samples()
+        return(self._average(self.mean, self.sum_lin, self.sum_sqr))
+
+    def get_lat_prof(self, coef=(0.5, 0.5, -1.)):
+        """
+        Average of a linear combination of the diagonal components of the
+        pressure tensor, :math:`\\sum_{\\alpha} c_{\\alpha}P_{\\alpha\\alpha}(z)`,
+        and its standard deviation.
+
+        The default coefficients give the lateral pressure profile as stored
+        by **LatPressProf**: :math:`\\left[P_{xx}(z) + P_{yy}(z)\\right] / 2 -
+        P_{zz}(z)`.
+
+        :param coef: Coefficients of |P_xx|, |P_yy| and |P_zz|.
+        :type coef: [float]
+        :returns: prof, prof_err
+        :rtype: ndarray([slabs], dtype=float), ndarray([slabs], dtype=float)
+
+        """
+        self._check_samples()
+        coef = np.asarray(coef, dtype=float)
+        mean = np.dot(coef, self.mean[0:3])
+        sum_lin = np.dot(coef, self.sum_lin[0:3])
+        sum_sqr = np.einsum('a,abs,b->s', coef, self.sum_diag, coef)
+        return(self._average(mean, sum_lin, sum_sqr))
+
+    def _block_sums(self, coef=None, grades=None):
+        """
+        Sums of block averages at every block size, for the pressure tensor,
+        a linear combination of its diagonal components or the integral
+        momenta of the lateral pressure profile.
+
+        The 1st block size is the single sample.
+
+        :returns: blocks, sizes, sum_lin, sum_sqr
+        :rtype: ndarray([LEVELS + 1], dtype=int),
+            ndarray([LEVELS + 1], dtype=int),
+            ndarray([LEVELS + 1, ...], dtype=float),
+            ndarray([LEVELS + 1, ...], dtype=float)
+
+        """
+        self._check_samples()
+        blocks = np.concatenate([[self.samples], self.blocks])
+        sizes = 2**np.arange(self.LEVELS + 1)
+        sum_lin = np.concatenate([self.sum_lin[np.newaxis], self.blk_lin])
+        if(grades is not None):
+            # Linear sums of the raw momenta follow from those of the tensor.
+            raw_lin = self._raw_momenta(sum_lin)
+            raw_prod = np.concatenate([self.raw_prod[np.newaxis],
+                self.raw_blk_prod])
+            shift = self._momenta_shift(grades)
+            sum_lin = np.einsum('gij,lj->lgi', shift, raw_lin)
+            sum_sqr = np.einsum('gij,ljk,gik->lgi', shift, raw_prod, shift)
+        elif(coef is None):
+            sum_sqr = np.concatenate([self.sum_sqr[np.newaxis], self.blk_sqr])
+        else:
+            coef = np.asarray(coef, dtype=float)
+            sum_lin = np.einsum('a,las->ls', coef, sum_lin[:, 0:3])
+            sum_diag = np.concatenate([self.sum_diag[np.newaxis],
+                self.blk_diag])
+            sum_sqr = np.einsum('a,labs,b->ls', coef, sum_diag, coef)
+        return(blocks, sizes, sum_lin, sum_sqr)
+
+    def get_block_errors(self, coef=None, grades=None):
+        """
+        Statistical error of the averages estimated from the block averages
+        of each size: :math:`\sigma_{b}/\sqrt{n_{b}}`, where
+        :math:`\sigma_{b}` is the standard deviation of the :math:`n_{b}`
+        averages over blocks of :math:`b` samples.
+
+        The error grows with the block size until blocks are longer than the
+        correlation time of the samples, and then levels off at the actual
+        error. Block sizes with less than two blocks are given NaN errors.
+
+        :param coef: Coefficients of |P_xx|, |P_yy| and |P_zz|, for a linear
+            combination of the diagonal components (see **get_lat_prof**), or
+            None for the whole pressure tensor.
+        :param grades: Grades of the integral momenta of the lateral pressure
+            profile (see **get_momenta**), instead of **coef**.
+        :type coef: [float]
+        :type grades: [int]
+        :returns: Block sizes and errors of each slab at each block size.
+        :rtype: ndarray([LEVELS + 1], dtype=int),
+            ndarray([LEVELS + 1, ...], dtype=float)
+
+        """
+        blocks, sizes, err = self._block_errors(coef, grades)
+        return(sizes, err)
+
+    def _block_errors(self, coef=None, grades=None):
+        """
+        Number of blocks, block sizes and statistical errors of the averages
+        at each block size (see **get_block_errors**).
+
+        """
+        blocks, sizes, sum_lin, sum_sqr = self._block_sums(coef, grades)
+        shape = (-1,) + (1,)*(sum_lin.ndim - 1)
+        n = blocks.reshape(shape).astype(float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var = (sum_sqr - sum_lin**2/n)/(n - 1.)
+            err = np.sqrt(np.maximum(var, 0.)/n)
+        err[blocks < 2] = np.nan
+        return(blocks, sizes, err)
+
+    def get_autocorr_time(self, coef=None, grades=None):
+        """
+        Integrated autocorrelation time of each slab, in samples.
+
+        Estimated from the ratio between the block error and the naive error
+        of the samples, :math:`\tau = (\sigma_{b}^2 / n_{b}) /
+        (2\sigma_{1}^2 / N)`, at the largest block size with at least
+        **MIN_BLOCKS** blocks. Uncorrelated samples give
+        :math:`\tau = 1/2`.
+
+        :param coef: See **get_block_errors**.
+        :param grades: See **get_block_errors**.
+        :type coef: [float]
+        :type grades: [int]
+        :rtype: ndarray([...], dtype=float)
+
+        """
+        blocks, sizes, err = self._block_errors(coef, grades)
+        level = np.flatnonzero(blocks >= self.MIN_BLOCKS)
+        level = level[-1] if(len(level) > 0) else 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return(0.5*(err[level]/err[0])**2)
+
+    def get_required_samples(self, target_err, coef=None, grades=None):
+        """
+        Number of samples needed for the statistical error of the averages of
+        each slab to fall below **target_err**, given the current estimates of
+        the standard deviation and autocorrelation time.
+
+        :param target_err: Target statistical error.
+        :param coef: See **get_block_errors**.
+        :param grades: See **get_block_errors**.
+        :type target_err: float
+        :type coef: [float]
+        :type grades: [int]
+        :rtype: ndarray([...], dtype=int)
+
+        """
+        sizes, err = self.get_block_errors(coef, grades)
+        tau = self.get_autocorr_time(coef, grades)
+        var = self.samples*err[0]**2
+        return(np.ceil(2.*tau*var/target_err**2).astype(int))
+
+    def get_tension(self):
+        """
+        Average surface tension and its standard deviation.
+
+        :returns: tension, tension_err
+        :rtype: float, float
+
+        """
+        self._check_samples()
+        avg, err = self._average(*self.tension)
+        return(float(avg), float(err))
+
+    def _momenta_shift(self, grades):
+        """
+        Binomial shift from the raw integral momenta around the midplane to
+        the integral momenta centered at each slab (see |mom_n_def|):
+        :math:`\\mu_{n}(z_{i}) = \\sum_{j=0}^{n}\\binom{n}{j}
+        (z_{N/2}-z_{i})^{n-j}M_{j}`.
+
+        :param grades: Grades of the integral momenta.
+        :type grades: [int]
+        :rtype: ndarray([len(grades), slabs, raw_grade + 1], dtype=float)
+
+        """
+        assert len(grades) > 0, 'No grades'
+        for grade in grades:
+            assert 0 <= grade <= self.raw_grade, 'Grade {:d} is not followed '\
+                'sample by sample (see \'grades\')'.format(grade)
+        disp = self.height[self.slabs//2] - self.height
+        shift = np.zeros([len(grades), self.slabs, self.raw_grade + 1])
+        for idx, grade in enumerate(grades):
+            for j in range(grade + 1):
+                shift[idx, :, j] = math.comb(grade, j)*disp**(grade - j)
+        return(shift)
+
+    def get_momenta(self, grades):
+        """
+        Average integral momenta of the lateral pressure profile, centered at
+        each slab (see **LatPressProf.get_momenta**), and the standard
+        deviation of the integral momenta of the samples.
+
+        :param grades: Grades of the integral momenta, up to **raw_grade**.
+        :type grades: [int]
+        :returns: momenta, momenta_err
+        :rtype: ndarray([len(grades), slabs], dtype=float),
+            ndarray([len(grades), slabs], dtype=float)
+
+        """
+        self._check_samples()
+        shift = self._momenta_shift(grades)
+        raw_mean = self._raw_momenta(self.mean[np.newaxis])[0]
+        raw_lin = self._raw_momenta(self.sum_lin[np.newaxis])[0]
+        raw_cov = self.raw_prod - np.outer(raw_lin, raw_lin)/self.samples
+        raw_cov /= float(self.samples - 1.)
+        momenta = np.matmul(shift, raw_mean + raw_lin/float(self.samples))
+        var = np.einsum('gij,jk,gik->gi', shift, raw_cov, shift)
+        return(momenta, np.sqrt(np.maximum(var, 0.)))
+
+    def get_momenta_series(self, grades):
+        """
+        Time series of the integral momenta of the lateral pressure profile,
+        centered at each slab, for every **stride**-th sample.
+
+        :param grades: Grades of the integral momenta, up to **raw_grade**.
+        :type grades: [int]
+        :rtype:
+            ndarray([ceil(samples / stride), len(grades), slabs], dtype=float)
+
+        """
+        self._check_samples()
+        assert self.stride > 0, 'No time series of integral momenta (see '\
+            '\'stride\')'
+        return(np.einsum('gij,nj->ngi', self._momenta_shift(grades),
+            self.raw_series))